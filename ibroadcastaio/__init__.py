@@ -1,7 +1,10 @@
 """Provide a package for ibroadcastaio."""
 
 from .client import IBroadcastClient
+from .scheduler import Priority, RequestScheduler
 
 __all__ = [
     "IBroadcastClient",
+    "Priority",
+    "RequestScheduler",
 ]
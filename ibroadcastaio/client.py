@@ -1,25 +1,59 @@
 import importlib.metadata
 import logging
-from typing import Any, AsyncGenerator, Dict
-
-from aiohttp import ClientSession
-
-from ibroadcastaio.const import BASE_API_URL, BASE_LIBRARY_URL, REFERER, STATUS_API
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Mapping
+
+from aiohttp import ClientResponseError, ClientSession
+
+from ibroadcastaio.const import (
+    BASE_API_URL,
+    BASE_LIBRARY_URL,
+    INTERNED_FIELDS,
+    REFERER,
+    STATUS_API,
+)
+from ibroadcastaio.memory import InternPool, deep_getsizeof, store_usage
+from ibroadcastaio.sampling import TrackSampler
+from ibroadcastaio.scheduler import Priority, RequestScheduler
+from ibroadcastaio.snapshot import LibrarySnapshot, write_snapshot
+from ibroadcastaio.stats import TrackStatistics
+from ibroadcastaio.views import TrackViews
 
 
 class IBroadcastClient:
     """iBroadcast API Client to use the API in an async manner"""
 
-    def __init__(self, http_session: ClientSession) -> None:
-        """Main constructor"""
+    def __init__(
+        self,
+        http_session: ClientSession,
+        api_url: str = BASE_API_URL,
+        library_url: str = BASE_LIBRARY_URL,
+        scheduler: RequestScheduler | None = None,
+    ) -> None:
+        """
+        Main constructor, the URLs can point to another (test) server.
+
+        Pass a scheduler to share its concurrency limit with other clients or requests.
+        """
         self.http_session = http_session
-        self._albums: Dict[int, Any] = {}
-        self._artists: Dict[int, Any] = {}
-        self._playlists: Dict[int, Any] = {}
-        self._tags: Dict[int, Any] = {}
-        self._tracks: Dict[int, Any] = {}
+        self._api_url = api_url
+        self._library_url = library_url
+        self._scheduler = scheduler or RequestScheduler()
+        self._albums: Mapping[int, Any] = {}
+        self._artists: Mapping[int, Any] = {}
+        self._playlists: Mapping[int, Any] = {}
+        self._tags: Mapping[int, Any] = {}
+        self._tracks: Mapping[int, Any] = {}
         self._settings: Dict[str, Any] = {}
         self._status: Dict[str, Any] = {}
+        self._credentials: tuple[str, str] | None = None
+        self._generation: int = 0
+        self._resolved_playlists: Dict[int, Dict[str, Any]] = {}
+        self._snapshot: LibrarySnapshot | None = None
+        self._statistics: TrackStatistics | None = None
+        self._track_views = TrackViews({})
+        self._sampler: TrackSampler | None = None
+        self._interning: Dict[str, int] = {}
 
     async def login(self, username: str, password: str) -> Dict[str, Any]:
         """Login to the iBroadcast API and return the status dict"""
@@ -34,7 +68,7 @@ class IBroadcastClient:
 
         try:
             self._status = await self.__post(
-                f"{BASE_API_URL}{STATUS_API}",
+                f"{self._api_url}{STATUS_API}",
                 {"content_type": "application/json"},
                 data,
             )
@@ -45,8 +79,42 @@ class IBroadcastClient:
         if "user" not in self._status:
             raise ValueError("Invalid credentials")
 
+        self._credentials = (username, password)
         return self._status
 
+    def export_session(self) -> Dict[str, Any]:
+        """Export the authenticated session, so another client can resume it without a login"""
+        if "user" not in self._status:
+            raise ValueError("Not logged in. Please call login first.")
+
+        return {
+            "token": self._status["user"]["token"],
+            "user_id": self._status["user"]["id"],
+            "settings": self._status.get("settings", {}),
+        }
+
+    def resume_session(
+        self,
+        session: Dict[str, Any],
+        username: str | None = None,
+        password: str | None = None,
+    ) -> None:
+        """
+        Resume a session exported by export_session, without any API call.
+
+        The token is only checked by the first API call. When it got rejected and credentials
+        are given, the client logs in again and retries that call once.
+        """
+        self._status = {
+            "user": {"token": session["token"], "id": session["user_id"]},
+            "settings": session.get("settings", {}),
+        }
+        self._credentials = (
+            (username, password)
+            if username is not None and password is not None
+            else None
+        )
+
     def get_version(self) -> str:
         """Get the version of the ibroadcastaio package"""
         return importlib.metadata.version("ibroadcastaio")
@@ -54,8 +122,6 @@ class IBroadcastClient:
     async def refresh_library(self) -> None:
         """Fetch the library to cache it locally"""
         data: Dict[str, Any] = {
-            "_token": self._status["user"]["token"],
-            "_userid": self._status["user"]["id"],
             "client": REFERER,
             "version": self.get_version(),
             "mode": "library",
@@ -67,53 +133,101 @@ class IBroadcastClient:
             For now we fetch the complete librady and split it into in memory class members.
             Later, we remove this step and rewrite methods such as _get_albums(album_id) to directly fetch it from the API.
         """
-        library = await self.__post(
-            f"{BASE_LIBRARY_URL}", {"content_type": "application/json"}, data
+        library = await self.__post_authenticated(
+            self._library_url, data, Priority.BACKGROUND
         )
 
+        old_playlists = self._playlists
+        old_tracks = self._tracks
+        pool = InternPool(INTERNED_FIELDS)
+
         self._albums = {
             album["album_id"]: album
             async for album in self.__json_to_dict(
-                library["library"]["albums"], "album_id"
+                library["library"]["albums"], "album_id", pool
             )
         }
 
         self._artists = {
             artist["artist_id"]: artist
             async for artist in self.__json_to_dict(
-                library["library"]["artists"], "artist_id"
+                library["library"]["artists"], "artist_id", pool
             )
         }
 
         self._playlists = {
             playlist["playlist_id"]: playlist
             async for playlist in self.__json_to_dict(
-                library["library"]["playlists"], "playlist_id"
+                library["library"]["playlists"], "playlist_id", pool
             )
         }
 
         """See here the exception for tags: https://devguide.ibroadcast.com/?p=library#get-library"""
         if isinstance(library["library"]["tags"], dict):
             self._tags = {
-                int(tag_id): {**tag, "tag_id": int(tag_id)}
-                for tag_id, tag in library["library"]["tags"].items()
+                int(tag_id): tag for tag_id, tag in library["library"]["tags"].items()
             }
+            for tag_id, tag in self._tags.items():
+                tag["tag_id"] = tag_id
         else:
             self._tags = {
                 tag["tag_id"]: tag
                 async for tag in self.__json_to_dict(
-                    library["library"]["tags"], "tag_id"
+                    library["library"]["tags"], "tag_id", pool
                 )
             }
 
         self._tracks = {
             track["track_id"]: track
             async for track in self.__json_to_dict(
-                library["library"]["tracks"], "track_id"
+                library["library"]["tracks"], "track_id", pool
             )
         }
 
         self._settings = library["settings"]
+        self._track_views = TrackViews(self._tracks)
+        self._interning = pool.report()
+
+        self._invalidate_resolved_playlists(old_playlists, old_tracks)
+        self._generation += 1
+        self._detach_snapshot()
+
+    async def export_library_snapshot(self, path: str) -> None:
+        """Write the cached library into a snapshot file that other clients can attach to"""
+        self._check_library_loaded()
+        write_snapshot(
+            path,
+            {
+                "albums": self._albums,
+                "artists": self._artists,
+                "playlists": self._playlists,
+                "tags": self._tags,
+                "tracks": self._tracks,
+            },
+            self._settings,
+        )
+
+    async def attach_library_snapshot(self, path: str) -> None:
+        """
+        Use a snapshot file as the library instead of fetching it.
+
+        The file is memory-mapped read-only, so any number of clients, also in other
+        processes, share one copy. Rows are decoded on access. Calling refresh_library
+        replaces the snapshot with a freshly fetched library again, mappings returned
+        before stay usable.
+        """
+        snapshot = LibrarySnapshot(path)
+        self._snapshot = snapshot
+        self._albums = snapshot.stores["albums"]
+        self._artists = snapshot.stores["artists"]
+        self._playlists = snapshot.stores["playlists"]
+        self._tags = snapshot.stores["tags"]
+        self._tracks = snapshot.stores["tracks"]
+        self._settings = snapshot.settings
+        self._track_views = TrackViews(self._tracks)
+        self._interning = {}
+        self._resolved_playlists = {}
+        self._generation += 1
 
     async def get_artwork_url(self, entity_id: int, entity_type: str) -> str:
         self._check_library_loaded()
@@ -205,7 +319,7 @@ class IBroadcastClient:
         self._check_library_loaded()
         return self._artists.get(artist_id, {})
 
-    async def get_artists(self) -> Dict[int, Any]:
+    async def get_artists(self) -> Mapping[int, Any]:
         """Get all artists"""
         self._check_library_loaded()
         return self._artists
@@ -214,7 +328,7 @@ class IBroadcastClient:
         self._check_library_loaded()
         return self._tags.get(tag_id, {})
 
-    async def get_tags(self) -> Dict[int, Any]:
+    async def get_tags(self) -> Mapping[int, Any]:
         self._check_library_loaded()
         return self._tags
 
@@ -226,7 +340,7 @@ class IBroadcastClient:
         self._check_library_loaded()
         return self._albums.get(album_id, {})
 
-    async def get_albums(self) -> Dict[int, Any]:
+    async def get_albums(self) -> Mapping[int, Any]:
         self._check_library_loaded()
         return self._albums
 
@@ -234,28 +348,246 @@ class IBroadcastClient:
         self._check_library_loaded()
         return self._tracks.get(track_id, {})
 
-    async def get_tracks(self) -> Dict[int, Any]:
+    async def get_tracks(self, include_trashed: bool = True) -> Mapping[int, Any]:
+        self._check_library_loaded()
+        return self._tracks if include_trashed else self._track_views.active
+
+    async def get_tracks_by_type(self, track_type: str) -> Mapping[int, Any]:
+        """Get the non-trashed tracks of a mime type, such as audio/mpeg"""
+        self._check_library_loaded()
+        return self._track_views.by_type.get(track_type, {})
+
+    async def get_recent_tracks(
+        self, since: datetime, until: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the non-trashed tracks uploaded since (until excluded), newest first.
+
+        iBroadcast reports upload times in UTC, so naive since and until datetimes are taken
+        as UTC, not local time. Pass timezone-aware datetimes to use another timezone.
+        """
         self._check_library_loaded()
-        return self._tracks
+        return self._track_views.uploaded_between(since, until)
 
     async def get_playlist(self, playlist_id: int) -> Dict[str, Any]:
         self._check_library_loaded()
         return self._playlists.get(playlist_id, {})
 
-    async def get_playlists(self) -> Dict[int, Any]:
+    async def get_playlists(self) -> Mapping[int, Any]:
         self._check_library_loaded()
         return self._playlists
 
+    async def get_resolved_playlist(
+        self, playlist_id: int, offset: int = 0, limit: int | None = None
+    ) -> Dict[str, Any]:
+        """
+        Get a playlist with its tracks resolved into track dicts.
+
+        Trashed and missing tracks are skipped. The resolution is cached until the playlist
+        or one of its tracks changes, so only the requested page of tracks is built per call.
+        """
+        if offset < 0:
+            raise ValueError(f"Offset must not be negative, got {offset}")
+        if limit is not None and limit < 0:
+            raise ValueError(f"Limit must not be negative, got {limit}")
+
+        self._check_library_loaded()
+        playlist = self._playlists.get(playlist_id)
+        if not playlist:
+            raise ValueError(f"Playlist with id {playlist_id} not found")
+
+        resolved = self._resolved_playlists.get(playlist_id)
+        if resolved is None:
+            resolved = self._resolve_playlist(playlist)
+            self._resolved_playlists[playlist_id] = resolved
+
+        track_ids = resolved["track_ids"]
+        end = None if limit is None else offset + limit
+        return {
+            "playlist_id": playlist_id,
+            "name": playlist.get("name"),
+            "artwork_id": resolved["artwork_id"],
+            "duration": resolved["duration"],
+            "total": len(track_ids),
+            "offset": offset,
+            "tracks": [self._tracks[track_id] for track_id in track_ids[offset:end]],
+        }
+
+    async def get_track_statistics(self, group_by: str | None = None) -> Dict[Any, Any]:
+        """
+        Get count, sum, min, max and mean of the numeric track columns.
+
+        Without group_by the result covers the whole library, otherwise it maps each
+        artist_id, album_id, genre, year or tag id to its statistics. Results are cached
+        until the library changes.
+        """
+        self._check_library_loaded()
+        if self._statistics is None or self._statistics.generation != self._generation:
+            self._statistics = TrackStatistics(
+                self._tracks,
+                self._tags,
+                self._track_views.upload_timestamps,
+                self._generation,
+            )
+        return self._statistics.summary(group_by)
+
+    async def get_random_track(self, weight: str | None = None) -> Dict[str, Any]:
+        """Get a random non-trashed track, uniformly or weighted by rating or plays"""
+        return self._get_sampler().sample(weight)
+
+    async def get_random_tracks(
+        self, count: int, weight: str | None = None
+    ) -> List[Dict[str, Any]]:
+        """Get count random non-trashed tracks, which may repeat"""
+        sampler = self._get_sampler()
+        return [sampler.sample(weight) for _ in range(count)]
+
+    async def get_shuffled_tracks(
+        self, scope: str | None = None, scope_id: Any = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Get a queue of non-trashed tracks in random order, each track only once.
+
+        Without scope the queue holds the whole library, otherwise the tracks of the
+        artist, album, tag or playlist with id scope_id, or of the genre named scope_id.
+        """
+        sampler = self._get_sampler()
+        stores: Dict[str, Mapping[Any, Any]] = {
+            "artist": self._artists,
+            "album": self._albums,
+            "tag": self._tags,
+            "playlist": self._playlists,
+        }
+
+        if scope is None:
+            track_ids: Any = self._track_views.active
+        elif scope == "genre":
+            track_ids = sampler.genre_track_ids(scope_id)
+        elif scope in stores:
+            entity = stores[scope].get(scope_id)
+            if not entity:
+                raise ValueError(f"{scope.capitalize()} with id {scope_id} not found")
+            track_ids = entity.get("tracks") or []
+        else:
+            raise ValueError(f"Unsupported scope: {scope}")
+
+        return sampler.shuffled(track_ids)
+
+    async def get_memory_usage(self, sample_size: int | None = 1000) -> Dict[str, Any]:
+        """
+        Get the memory used by the cached library, its indexes and caches.
+
+        Every store reports its entry count, deep byte size and most expensive fields. Sizes
+        of stores larger than sample_size rows are extrapolated from a sample, pass None to
+        measure every row. A memory-mapped snapshot is shared and reported separately.
+        """
+        stores: Dict[str, Mapping[Any, Any]] = {
+            "albums": self._albums,
+            "artists": self._artists,
+            "playlists": self._playlists,
+            "tags": self._tags,
+            "tracks": self._tracks,
+        }
+        main_keys = {
+            "albums": "album_id",
+            "artists": "artist_id",
+            "playlists": "playlist_id",
+            "tags": "tag_id",
+            "tracks": "track_id",
+        }
+        # Interned values are shared between rows, except for the unique main key of a store
+        usage: Dict[str, Any] = {
+            name: store_usage(store, sample_size, INTERNED_FIELDS - {main_keys[name]})
+            for name, store in stores.items()
+        }
+        usage["settings"] = {
+            "count": len(self._settings),
+            "bytes": deep_getsizeof(self._settings, set()),
+        }
+
+        # Indexes reference the stores, which are already counted above
+        seen = {id(store) for store in stores.values()}
+        usage["indexes"] = {
+            name: {"bytes": deep_getsizeof(index, seen)}
+            for name, index in (
+                ("resolved_playlists", self._resolved_playlists),
+                ("track_views", self._track_views),
+                ("statistics", self._statistics),
+                ("sampler", self._sampler),
+            )
+        }
+        usage["interning"] = self._interning
+        usage["snapshot_bytes"] = self._snapshot.size if self._snapshot else 0
+        usage["total_bytes"] = (
+            sum(usage[name]["bytes"] for name in stores)
+            + usage["settings"]["bytes"]
+            + sum(index["bytes"] for index in usage["indexes"].values())
+        )
+
+        logging.debug(f"Library memory usage: {usage}")
+        return usage
+
+    async def get_request_metrics(self) -> Dict[str, Any]:
+        """Get the concurrency limit, queue depths and wait times of the API requests"""
+        return self._scheduler.metrics()
+
     async def __post(
-        self, url: str, headers: Dict[str, Any], data: Dict[str, Any]
+        self,
+        url: str,
+        headers: Dict[str, Any],
+        data: Dict[str, Any],
+        priority: Priority = Priority.INTERACTIVE,
     ) -> Dict[str, Any]:
-        """Make a POST request and return the response as a dictionary"""
-        async with self.http_session.post(url, headers=headers, json=data) as response:
-            response.raise_for_status()
-            return await response.json()
+        """Make a POST request through the scheduler and return the response as a dictionary"""
+
+        async def send() -> Dict[str, Any]:
+            async with self.http_session.post(
+                url, headers=headers, json=data
+            ) as response:
+                response.raise_for_status()
+                return await response.json()
+
+        return await self._scheduler.run(priority, send)
+
+    async def __post_authenticated(
+        self, url: str, data: Dict[str, Any], priority: Priority
+    ) -> Dict[str, Any]:
+        """Make a POST request with the session token, logging in again once if it got rejected"""
+        auth_error: ClientResponseError | None = None
+        for attempt in range(2):
+            auth_error = None
+            try:
+                response = await self.__post(
+                    url,
+                    {"content_type": "application/json"},
+                    {
+                        **data,
+                        "_token": self._status["user"]["token"],
+                        "_userid": self._status["user"]["id"],
+                    },
+                    priority,
+                )
+                if response.get("authenticated") is not False:
+                    return response
+            except ClientResponseError as e:
+                if e.status not in (401, 403):
+                    raise
+                auth_error = e
+
+            if attempt or self._credentials is None:
+                break
+            logging.info("Session token rejected, logging in again")
+            await self.login(*self._credentials)
+
+        raise ValueError(
+            "Session is not authenticated. Please login again."
+        ) from auth_error
 
     async def __json_to_dict(
-        self, data: list[dict[str, Any]], main_key: str
+        self,
+        data: list[dict[str, Any]],
+        main_key: str,
+        pool: InternPool | None = None,
     ) -> AsyncGenerator[dict[str, Any], None]:
         """
         Convert the library json into python dicts. See the readme for all fields.
@@ -321,12 +653,63 @@ class IBroadcastClient:
 
         keymap = {v: k for (k, v) in data["map"].items() if not isinstance(v, dict)}
 
+        candidates = pool.candidates(keymap.values(), main_key) if pool else ()
         for key, value in data.items():
             if type(value) is list:
                 result = {keymap[i]: value[i] for i in range(len(value))}
                 result[main_key] = int(key)
+                if pool is not None:
+                    pool.intern_row(result, candidates)
                 yield result
 
+    def _resolve_playlist(self, playlist: Dict[str, Any]) -> Dict[str, Any]:
+        """Collect the playable track ids, total duration and artwork id of a playlist"""
+        track_ids = []
+        duration = 0
+        artwork_id = playlist.get("artwork_id")
+        for track_id in playlist.get("tracks") or []:
+            track = self._track_views.active.get(track_id)
+            if not track:
+                continue
+            track_ids.append(track_id)
+            duration += track.get("length") or 0
+            if artwork_id is None:
+                artwork_id = track.get("artwork_id")
+
+        return {"track_ids": track_ids, "duration": duration, "artwork_id": artwork_id}
+
+    def _invalidate_resolved_playlists(
+        self, old_playlists: Mapping[int, Any], old_tracks: Mapping[int, Any]
+    ) -> None:
+        """Drop cached playlist resolutions whose playlist or tracks changed"""
+        for playlist_id in list(self._resolved_playlists):
+            playlist = self._playlists.get(playlist_id)
+            if (
+                not playlist
+                or playlist != old_playlists.get(playlist_id)
+                or any(
+                    self._tracks.get(track_id) != old_tracks.get(track_id)
+                    for track_id in playlist.get("tracks") or []
+                )
+            ):
+                del self._resolved_playlists[playlist_id]
+
+    def _get_sampler(self) -> TrackSampler:
+        """Get the sampler of the current library, rebuilding it when the library changed"""
+        self._check_library_loaded()
+        if self._sampler is None or self._sampler.generation != self._generation:
+            self._sampler = TrackSampler(self._track_views.active, self._generation)
+        return self._sampler
+
+    def _detach_snapshot(self) -> None:
+        """
+        Drop the reference to the attached snapshot, if any.
+
+        It is not closed, so mappings returned earlier by the get_* methods stay usable. The
+        file is unmapped once nothing references the snapshot or its stores anymore.
+        """
+        self._snapshot = None
+
     def _check_library_loaded(self) -> None:
         """Check if the library is loaded"""
         if not self._settings:
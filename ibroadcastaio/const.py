@@ -6,3 +6,18 @@ BASE_LIBRARY_URL = "https://library.ibroadcast.com"
 STATUS_API = "/s/JSON/status"
 
 REFERER = "ibroadcastaio-client"
+
+# Low-cardinality fields whose equal values are shared between decoded library rows
+INTERNED_FIELDS = frozenset(
+    {
+        "album_id",
+        "artist_id",
+        "artwork_id",
+        "genre",
+        "path",
+        "replay_gain",
+        "type",
+        "uploaded_on",
+        "year",
+    }
+)
@@ -0,0 +1,139 @@
+"""Memory footprint estimates of the cached iBroadcast library."""
+
+import sys
+from itertools import islice
+from typing import Any, Collection, Dict, Iterable, Mapping, Set
+
+TOP_FIELDS = 5
+NUMBER_TYPES = {int, float}
+SINGLETON_TYPES = {bool, type(None)}
+
+
+def deep_getsizeof(value: Any, seen: Set[int]) -> int:
+    """Get the size in bytes of value and everything it references, skipping ids in seen"""
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += _items_getsizeof(value.keys(), seen) + _items_getsizeof(
+            value.values(), seen
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += _items_getsizeof(value, seen)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        size += deep_getsizeof(vars(value), seen)
+    return size
+
+
+def _items_getsizeof(items: Iterable[Any], seen: Set[int]) -> int:
+    """Get the deep size of the items of a container"""
+    # Id lists and sets are the bulk of the library, so sum plain numbers without tracking
+    types = set(map(type, items))
+    if types <= SINGLETON_TYPES:
+        return 0
+    if types <= NUMBER_TYPES:
+        return sum(map(sys.getsizeof, items))
+    return sum(deep_getsizeof(item, seen) for item in items)
+
+
+def store_usage(
+    store: Mapping[int, Any],
+    sample_size: int | None,
+    shared_fields: Collection[str] = (),
+) -> Dict[str, Any]:
+    """
+    Get the byte size, entry count and most expensive fields of a store.
+
+    Only sample_size evenly spread rows are measured and extrapolated to the whole store,
+    stores that are not dicts (such as memory-mapped snapshots) only count their container.
+    Values shared between rows are counted once. The values of shared_fields (such as
+    interned fields) are shared by many rows, so they are not extrapolated.
+    """
+    count = len(store)
+    usage: Dict[str, Any] = {"count": count, "bytes": sys.getsizeof(store)}
+    if not isinstance(store, dict) or not count:
+        usage.update(estimated=False, fields={})
+        return usage
+
+    step = 1 if sample_size is None else max(1, count // max(sample_size, 1))
+    sampled = 0
+    row_bytes = 0
+    shared_bytes = 0
+    field_bytes: Dict[str, int] = {}
+    seen: Set[int] = set()
+    field_seen: Dict[str, Set[int]] = {}
+    for key, row in islice(store.items(), 0, None, step):
+        sampled += 1
+        row_bytes += deep_getsizeof(key, seen)
+        if not isinstance(row, dict):
+            row_bytes += deep_getsizeof(row, seen)
+            continue
+
+        row_bytes += sys.getsizeof(row)
+        for field, value in row.items():
+            size = deep_getsizeof(field, seen) + deep_getsizeof(value, seen)
+            if field in shared_fields:
+                shared_bytes += size
+            else:
+                row_bytes += size
+            field_bytes[field] = field_bytes.get(field, 0) + deep_getsizeof(
+                value, field_seen.setdefault(field, set())
+            )
+
+    scale = count / sampled
+    fields = {
+        field: int(size if field in shared_fields else size * scale)
+        for field, size in field_bytes.items()
+    }
+    expensive = sorted(fields.items(), key=lambda item: item[1], reverse=True)
+    usage["bytes"] += int(row_bytes * scale) + shared_bytes
+    usage["estimated"] = sampled < count
+    usage["fields"] = dict(expensive[:TOP_FIELDS])
+    return usage
+
+
+class InternPool:
+    """Shares equal values between decoded rows and counts the memory that saves"""
+
+    def __init__(self, fields: Collection[str]) -> None:
+        """Pool the str and int values of fields, which are immutable so sharing them is safe"""
+        self.fields = fields
+        self._values: Dict[tuple[type, Any], Any] = {}
+        self.deduplicated = 0
+        self.bytes_saved = 0
+
+    def candidates(self, fields: Iterable[str], main_key: str) -> tuple[str, ...]:
+        """
+        Get the pooled fields of a store from its field names.
+
+        The main key is unique per row, so pooling it would only fill the pool.
+        """
+        return tuple(
+            field for field in fields if field in self.fields and field != main_key
+        )
+
+    def intern_row(self, row: Dict[str, Any], candidates: Iterable[str]) -> None:
+        """Replace the pooled values of a row by their shared instances"""
+        values = self._values
+        for field in candidates:
+            item = row.get(field)
+            kind = type(item)
+            if kind is not str and kind is not int:
+                continue
+            # Keyed by type as well, so True, 1 and 1.0 never replace each other
+            shared = values.setdefault((kind, item), item)
+            if shared is item:
+                continue
+            row[field] = shared
+            self.deduplicated += 1
+            self.bytes_saved += sys.getsizeof(item)
+
+    def report(self) -> Dict[str, int]:
+        """Get the number of distinct pooled values, replaced values and bytes saved"""
+        return {
+            "values": len(self._values),
+            "deduplicated": self.deduplicated,
+            "bytes_saved": self.bytes_saved,
+        }
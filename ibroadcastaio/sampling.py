@@ -0,0 +1,122 @@
+"""Random sampling and shuffling of iBroadcast tracks."""
+
+import random
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Sequence
+
+SAMPLE_WEIGHTS = ("rating", "plays")
+
+
+class AliasTable:
+    """Walker/Vose alias table to draw weighted random indexes in O(1)"""
+
+    def __init__(self, weights: Sequence[float]) -> None:
+        """Build the probability and alias columns in O(n)"""
+        total = sum(weights)
+        if not weights or total <= 0:
+            raise ValueError("At least one positive weight is required")
+
+        size = len(weights)
+        scaled = [weight * size / total for weight in weights]
+        self._probability = array("d", [1.0] * size)
+        self._alias = array("q", range(size))
+
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._probability[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample(self, rng: random.Random) -> int:
+        """Draw a random index, proportional to its weight"""
+        index = rng.randrange(len(self._probability))
+        if rng.random() < self._probability[index]:
+            return index
+        return self._alias[index]
+
+
+class TrackSampler:
+    """
+    Uniform and weighted random picks and shuffled queues over a track store.
+
+    The track ids are collected once and the alias tables are built on first use per weight,
+    so the owner only rebuilds the sampler when the library changes.
+    """
+
+    def __init__(
+        self,
+        tracks: Mapping[int, Any],
+        generation: int,
+        rng: random.Random | None = None,
+    ) -> None:
+        """Collect the ids of all tracks to sample from"""
+        self.generation = generation
+        self._tracks = tracks
+        self._track_ids = array("q", tracks)
+        self._random = rng or random.Random()
+        self._alias_tables: Dict[str, AliasTable] = {}
+        self._genres: Dict[Any, List[int]] | None = None
+
+    def sample(self, weight: str | None = None) -> Dict[str, Any]:
+        """
+        Draw a random track, uniformly or weighted by rating or plays.
+
+        The weight of a track is its value plus one, so unrated or unplayed tracks still play.
+        """
+        if not self._track_ids:
+            raise ValueError("No tracks to sample from")
+
+        if weight is None:
+            index = self._random.randrange(len(self._track_ids))
+        else:
+            index = self._alias_table(weight).sample(self._random)
+        return self._tracks[self._track_ids[index]]
+
+    def genre_track_ids(self, genre: str) -> List[int]:
+        """Get the ids of all tracks of a genre"""
+        if self._genres is None:
+            self._genres = {}
+            for track_id, track in self._tracks.items():
+                self._genres.setdefault(track.get("genre"), []).append(track_id)
+        return self._genres.get(genre, [])
+
+    def shuffled(self, track_ids: Iterable[int]) -> Iterator[Dict[str, Any]]:
+        """Yield the known tracks of track_ids once each, in random order"""
+        queue = array(
+            "q",
+            [
+                track_id
+                for track_id in dict.fromkeys(track_ids)
+                if track_id in self._tracks
+            ],
+        )
+        # Lazy Fisher-Yates: each step only swaps one pick to the end of the queue
+        for end in range(len(queue) - 1, -1, -1):
+            pick = self._random.randint(0, end)
+            queue[pick], queue[end] = queue[end], queue[pick]
+            yield self._tracks[queue[end]]
+
+    def _alias_table(self, weight: str) -> AliasTable:
+        """Get the alias table of a weight, building it on first use"""
+        if weight not in SAMPLE_WEIGHTS:
+            raise ValueError(f"Unsupported weight: {weight}")
+
+        if weight not in self._alias_tables:
+            self._alias_tables[weight] = AliasTable(
+                [
+                    max(_number(self._tracks[track_id].get(weight)), 0.0) + 1.0
+                    for track_id in self._track_ids
+                ]
+            )
+        return self._alias_tables[weight]
+
+
+def _number(value: Any) -> float:
+    """Convert a track value to a float, where missing or invalid values count as 0"""
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,198 @@
+"""Prioritized, adaptive concurrency limiting of iBroadcast API calls."""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, TypeVar
+
+from aiohttp import ClientResponseError, ServerTimeoutError
+
+T = TypeVar("T")
+
+# Weight of a response in the latency baseline of its priority
+BASELINE_DRIFT = 0.1
+
+
+class Priority(IntEnum):
+    """Priority class of a request, lower values are served first"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class RequestScheduler:
+    """
+    Runs requests within an AIMD (additive increase, multiplicative decrease) concurrency limit.
+
+    Waiting requests are served by priority, then in arrival order, and background requests
+    leave one slot of the limit free for interactive ones. A healthy response grows the limit
+    by 1/limit, so by about one per limit completions, but only while the limit is nearly used.
+    A 429 or 5xx response, a timeout, or a response that takes latency_tolerance times longer
+    than the usual latency of its priority, multiplies the limit by backoff. That happens at
+    most once per round trip, so a burst of failures only counts once. The usual latency is tracked per
+    priority, so slow library downloads are not compared with quick API calls.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_tolerance: float = 2.0,
+        latency_floor: float = 0.5,
+        backoff: float = 0.5,
+    ) -> None:
+        """Configure the limits, responses faster than latency_floor seconds are never slow"""
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.latency_floor = latency_floor
+        self.backoff = backoff
+
+        self._in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self._last_decrease = float("-inf")
+        self._baseline: Dict[Priority, float | None] = {
+            priority: None for priority in Priority
+        }
+        self._queued = {priority: 0 for priority in Priority}
+        self._completed = {priority: 0 for priority in Priority}
+        self._wait_count = {priority: 0 for priority in Priority}
+        self._wait_total = {priority: 0.0 for priority in Priority}
+        self._wait_max = {priority: 0.0 for priority in Priority}
+        self._throttled = 0
+        self._timeouts = 0
+
+    async def run(self, priority: Priority, call: Callable[[], Awaitable[T]]) -> T:
+        """Wait for a free slot, then await call and adjust the limit to its outcome"""
+        queued_at = time.monotonic()
+        await self._acquire(priority)
+        started_at = time.monotonic()
+        self._record_wait(priority, started_at - queued_at)
+
+        try:
+            result = await call()
+        except ClientResponseError as e:
+            if e.status == 429 or e.status >= 500:
+                self._throttled += 1
+                self._decrease(started_at)
+            raise
+        except (asyncio.TimeoutError, ServerTimeoutError):
+            # No response within the timeout is the slowest response possible
+            self._timeouts += 1
+            self._decrease(started_at)
+            raise
+        else:
+            if self._is_slow(priority, time.monotonic() - started_at):
+                self._decrease(started_at)
+            else:
+                self._increase()
+            self._completed[priority] += 1
+            return result
+        finally:
+            self._release()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get the current limit, queue depths, completions and wait times per priority"""
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "throttled": self._throttled,
+            "timeouts": self._timeouts,
+            **{
+                priority.name.lower(): {
+                    "queued": self._queued[priority],
+                    "latency_baseline": self._baseline[priority],
+                    "completed": self._completed[priority],
+                    "wait_count": self._wait_count[priority],
+                    "wait_total": self._wait_total[priority],
+                    "wait_max": self._wait_max[priority],
+                    "wait_mean": (
+                        self._wait_total[priority] / self._wait_count[priority]
+                        if self._wait_count[priority]
+                        else 0.0
+                    ),
+                }
+                for priority in Priority
+            },
+        }
+
+    async def _acquire(self, priority: Priority) -> None:
+        """Take a slot, queueing behind the limit and higher priority requests"""
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._queued[priority] += 1
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # Still queued, it is skipped and uncounted when it reaches the front
+                self._queued[priority] -= 1
+            else:
+                # The slot was granted right before the cancellation
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        """Free a slot and hand it to the next waiting request"""
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Grant slots to waiting requests while the limit allows"""
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            # The front request has the highest priority, if it has to wait all others do
+            if self._in_flight >= self._capacity(Priority(priority)):
+                return
+            heapq.heappop(self._waiters)
+            self._queued[Priority(priority)] -= 1
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _capacity(self, priority: Priority) -> int:
+        """Get the number of slots a priority may fill, background leaves one for interactive"""
+        limit = int(self.limit)
+        if priority == Priority.BACKGROUND and limit > 1:
+            return limit - 1
+        return limit
+
+    def _is_slow(self, priority: Priority, latency: float) -> bool:
+        """Compare a latency with the usual latency of its priority, and update the latter"""
+        baseline = self._baseline[priority]
+        if baseline is None or latency < baseline:
+            self._baseline[priority] = latency
+            return False
+        # Drift towards the current latency, so a lasting change becomes the new normal
+        self._baseline[priority] = baseline + (latency - baseline) * BASELINE_DRIFT
+        return latency > max(baseline * self.latency_tolerance, self.latency_floor)
+
+    def _increase(self) -> None:
+        """Additively grow the limit after a healthy response, if the limit is nearly used"""
+        # The completed request still holds its slot here
+        if self._in_flight >= int(self.limit) - 1:
+            self.limit = min(self.limit + 1 / self.limit, float(self.max_limit))
+        self._wake()
+
+    def _decrease(self, started_at: float) -> None:
+        """Multiplicatively shrink the limit, once per round trip"""
+        if started_at < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.limit = max(self.limit * self.backoff, float(self.min_limit))
+        logging.debug(f"Decreased the request concurrency limit to {self.limit:.2f}")
+
+    def _record_wait(self, priority: Priority, wait: float) -> None:
+        """Add a queue wait time to the metrics"""
+        self._wait_count[priority] += 1
+        self._wait_total[priority] += wait
+        self._wait_max[priority] = max(self._wait_max[priority], wait)
@@ -0,0 +1,324 @@
+"""Memory-mapped library snapshots shared between iBroadcast clients."""
+
+import bisect
+import contextlib
+import json
+import math
+import mmap
+import os
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Literal, Mapping, Sequence
+
+from ibroadcastaio.views import upload_timestamps
+
+SNAPSHOT_MAGIC = b"IBSNAP01"
+SNAPSHOT_STORES = ("albums", "artists", "playlists", "tags", "tracks")
+
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+
+def write_snapshot(
+    path: str,
+    stores: Mapping[str, Mapping[int, Dict[str, Any]]],
+    settings: Dict[str, Any],
+) -> None:
+    """
+    Write the parsed library stores into a binary snapshot file.
+
+    Layout: magic, header length, JSON header, then 8 byte aligned sections. Every store has a
+    sorted int64 id column (the id to row index) and one column per field:
+
+        int:   int64 values, used when every row holds an int
+        float: float64 values, used when every row holds a float
+        bool:  uint8 values, used when every row holds a bool
+        str:   uint32 index per row into a deduplicated string table
+        json:  uint64 offsets into a blob of JSON encoded values, for everything else
+
+    The tracks store also has a derived upload_timestamp float column (NaN when unknown), so
+    the track views can be built without decoding rows. The file is written to a temporary
+    path first and then renamed, so clients that mapped an older snapshot are not affected.
+    """
+    body = bytearray()
+    header: Dict[str, Any] = {
+        "byteorder": sys.byteorder,
+        "settings": settings,
+        "stores": {},
+    }
+
+    for name in SNAPSHOT_STORES:
+        store = stores.get(name, {})
+        ids = sorted(store)
+        rows = [store[entity_id] for entity_id in ids]
+        fields: Dict[str, None] = {}
+        for row in rows:
+            fields.update(dict.fromkeys(row))
+
+        columns = {}
+        for field in fields:
+            columns[field] = _write_column(body, field, rows)
+
+        derived = {}
+        if name == "tracks":
+            timestamps = upload_timestamps(rows)
+            derived["upload_timestamp"] = {
+                "kind": "float",
+                "values": _append_section(
+                    body,
+                    array(
+                        "d", [math.nan if t is None else t for t in timestamps]
+                    ).tobytes(),
+                ),
+            }
+
+        header["stores"][name] = {
+            "count": len(ids),
+            "ids": _append_section(body, array("q", ids).tobytes()),
+            "columns": columns,
+            "derived": derived,
+        }
+
+    header_bytes = json.dumps(header).encode()
+    prefix = SNAPSHOT_MAGIC + len(header_bytes).to_bytes(8, "little") + header_bytes
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(prefix)
+            file.write(b"\0" * (_align(len(prefix)) - len(prefix)))
+            file.write(body)
+        os.replace(temporary_path, path)
+    except BaseException:
+        # Do not leave a partial file behind, such as after a full disk or an interrupt
+        with contextlib.suppress(OSError):
+            os.remove(temporary_path)
+        raise
+
+
+class LibrarySnapshot:
+    """
+    A read-only, memory-mapped library snapshot that can be shared between processes.
+
+    The file stays mapped as long as the snapshot or one of its stores is referenced. After
+    an explicit close, accessing a store raises a ValueError.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Map the snapshot file and expose its stores without copying them"""
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: List[memoryview] = [memoryview(self._mmap)]
+        self.closed = False
+        view = self._views[0]
+
+        if bytes(view[:8]) != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a library snapshot")
+
+        header_length = int.from_bytes(view[8:16], "little")
+        header_end = 16 + header_length
+        header = json.loads(bytes(view[16:header_end]))
+        if header["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"Snapshot {path} was written with another byte order")
+
+        self._base = _align(header_end)
+        self.settings: Dict[str, Any] = header["settings"]
+        self.stores: Dict[str, SnapshotStore] = {
+            name: SnapshotStore(self, meta) for name, meta in header["stores"].items()
+        }
+
+    @property
+    def size(self) -> int:
+        """Get the size of the mapped file in bytes"""
+        return len(self._mmap)
+
+    def close(self) -> None:
+        """Release all views and unmap the file"""
+        self.closed = True
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def _view(
+        self, offset: int, length: int, fmt: Literal["B", "I", "d", "q", "Q"]
+    ) -> "memoryview[Any]":
+        """Get a typed view on a section of the mapped file"""
+        start = self._base + offset
+        end = start + length * array(fmt).itemsize
+        view: "memoryview[Any]" = self._views[0][start:end].cast(fmt)
+        self._views.append(view)
+        return view
+
+
+class SnapshotStore(Mapping[int, Dict[str, Any]]):
+    """Mapping of entity id to row dict, decoded from the snapshot on access"""
+
+    def __init__(self, snapshot: LibrarySnapshot, meta: Dict[str, Any]) -> None:
+        """Build the column views of a single store"""
+        self._snapshot = snapshot
+        self._ids = snapshot._view(meta["ids"], meta["count"], "q")
+        self._columns = {
+            field: self._column_views(column, meta["count"])
+            for field, column in meta["columns"].items()
+        }
+        self._derived = {
+            field: self._column_views(column, meta["count"])
+            for field, column in meta.get("derived", {}).items()
+        }
+
+    def __getitem__(self, key: int) -> Dict[str, Any]:
+        self._check_open()
+        row = bisect.bisect_left(self._ids, key) if isinstance(key, int) else -1
+        if row < 0 or row >= len(self._ids) or self._ids[row] != key:
+            raise KeyError(key)
+
+        result: Dict[str, Any] = {}
+        for field, column in self._columns.items():
+            if column[0] == "int" or column[0] == "float":
+                result[field] = column[1][row]
+            elif column[0] == "bool":
+                result[field] = bool(column[1][row])
+            elif column[0] == "str":
+                _, index, offsets, blob = column
+                entry = index[row]
+                start, end = offsets[entry], offsets[entry + 1]
+                result[field] = str(blob[start:end], "utf-8")
+            else:
+                _, offsets, blob = column
+                start, end = offsets[row], offsets[row + 1]
+                if start != end:
+                    result[field] = json.loads(bytes(blob[start:end]))
+        return result
+
+    def column(self, field: str) -> Sequence[Any]:
+        """
+        Get the values of one field for all rows, in iteration order.
+
+        Numeric columns are returned as views on the mapped file, strings are decoded once per
+        distinct value. Missing fields are None, derived columns such as upload_timestamp
+        are included.
+        """
+        self._check_open()
+        column = self._columns.get(field) or self._derived.get(field)
+        if column is None:
+            return [None] * len(self._ids)
+
+        if column[0] == "int" or column[0] == "float":
+            return column[1]
+        if column[0] == "bool":
+            return [bool(value) for value in column[1]]
+        if column[0] == "str":
+            _, index, offsets, blob = column
+            table = [
+                str(blob[start:end], "utf-8")
+                for start, end in zip(offsets[:-1], offsets[1:])
+            ]
+            return [table[entry] for entry in index]
+
+        _, offsets, blob = column
+        return [
+            json.loads(bytes(blob[start:end])) if start != end else None
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def _column_views(self, column: Dict[str, Any], count: int) -> tuple[Any, ...]:
+        """Map the sections of a single column"""
+        snapshot = self._snapshot
+        if column["kind"] == "int":
+            return ("int", snapshot._view(column["values"], count, "q"))
+        if column["kind"] == "float":
+            return ("float", snapshot._view(column["values"], count, "d"))
+        if column["kind"] == "bool":
+            return ("bool", snapshot._view(column["values"], count, "B"))
+        if column["kind"] == "str":
+            index = snapshot._view(column["index"], count, "I")
+            offsets = snapshot._view(column["offsets"], column["size"] + 1, "Q")
+            blob = snapshot._view(column["blob"], offsets[-1], "B")
+            return ("str", index, offsets, blob)
+        offsets = snapshot._view(column["offsets"], count + 1, "Q")
+        blob = snapshot._view(column["blob"], offsets[-1], "B")
+        return ("json", offsets, blob)
+
+    def _check_open(self) -> None:
+        """Raise a clear error instead of failing on released memory"""
+        if self._snapshot.closed:
+            raise ValueError("The library snapshot of this store has been closed")
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+def _write_column(
+    body: bytearray, field: str, rows: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Append the section(s) of a single field and return its column metadata"""
+    present = all(field in row for row in rows)
+    values: List[Any] = [row.get(field) for row in rows]
+
+    if present and all(
+        type(value) is int and INT64_MIN <= value <= INT64_MAX for value in values
+    ):
+        return {
+            "kind": "int",
+            "values": _append_section(body, array("q", values).tobytes()),
+        }
+
+    if present and all(type(value) is float for value in values):
+        return {
+            "kind": "float",
+            "values": _append_section(body, array("d", values).tobytes()),
+        }
+
+    if present and all(type(value) is bool for value in values):
+        return {
+            "kind": "bool",
+            "values": _append_section(body, bytes(values)),
+        }
+
+    if present and all(type(value) is str for value in values):
+        table: Dict[str, int] = {}
+        index = array("I", [table.setdefault(value, len(table)) for value in values])
+        blob, offsets = _pack([value.encode() for value in table])
+        return {
+            "kind": "str",
+            "size": len(table),
+            "index": _append_section(body, index.tobytes()),
+            "offsets": _append_section(body, offsets.tobytes()),
+            "blob": _append_section(body, blob),
+        }
+
+    # Missing fields are stored as empty values, which is never valid JSON
+    blob, offsets = _pack(
+        [json.dumps(row[field]).encode() if field in row else b"" for row in rows]
+    )
+    return {
+        "kind": "json",
+        "offsets": _append_section(body, offsets.tobytes()),
+        "blob": _append_section(body, blob),
+    }
+
+
+def _pack(items: List[bytes]) -> tuple[bytes, "array[int]"]:
+    """Concatenate byte strings and return the blob with its offsets"""
+    offsets = array("Q", [0])
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    return b"".join(items), offsets
+
+
+def _append_section(body: bytearray, data: bytes) -> int:
+    """Append an 8 byte aligned section and return its offset"""
+    body.extend(b"\0" * (_align(len(body)) - len(body)))
+    offset = len(body)
+    body.extend(data)
+    return offset
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to a multiple of 8"""
+    return (offset + 7) & ~7
@@ -0,0 +1,135 @@
+"""Column based aggregation of iBroadcast track statistics."""
+
+import math
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Sequence
+
+from ibroadcastaio.views import track_column
+
+STAT_COLUMNS = ("length", "size", "plays", "rating", "year", "uploaded_time")
+STAT_GROUPS = ("artist_id", "album_id", "genre", "year", "tag")
+
+
+class TrackStatistics:
+    """
+    Aggregates numeric track columns, optionally grouped by a track field or tag.
+
+    The tracks are converted once into one value list per column, where missing or invalid
+    values are None and left out of min, max and mean. Grouping sorts the rows by group once,
+    so each group is a contiguous slice that sum/min/max process in a single call each. Built
+    statistics are immutable, so the owner rebuilds them per library generation.
+    """
+
+    def __init__(
+        self,
+        tracks: Mapping[int, Any],
+        tags: Mapping[int, Any],
+        upload_timestamps: Sequence[float],
+        generation: int,
+    ) -> None:
+        """Build the column lists of all tracks, reusing the parsed upload timestamps"""
+        self.generation = generation
+        self._tracks = tracks
+        self._columns = {
+            column: _numbers(track_column(tracks, column))
+            for column in STAT_COLUMNS
+            if column != "uploaded_time"
+        }
+        self._columns["uploaded_time"] = [
+            None if math.isnan(uploaded) else uploaded for uploaded in upload_timestamps
+        ]
+        self._complete = {
+            column: None not in values for column, values in self._columns.items()
+        }
+        self._tag_tracks = {
+            tag_id: tag.get("tracks") or [] for tag_id, tag in tags.items()
+        }
+        self._results: Dict[str | None, Any] = {}
+
+    def summary(self, group_by: str | None = None) -> Dict[Any, Any]:
+        """Get the statistics of all tracks, or per group when group_by is given"""
+        if group_by is not None and group_by not in STAT_GROUPS:
+            raise ValueError(f"Unsupported group: {group_by}")
+
+        if group_by not in self._results:
+            if group_by is None:
+                self._results[None] = self._aggregate(
+                    self._columns, 0, len(self._tracks)
+                )
+            else:
+                self._results[group_by] = self._grouped_summary(group_by)
+        return self._results[group_by]
+
+    def _grouped_summary(self, group_by: str) -> Dict[Any, Any]:
+        """Reorder the columns by group and aggregate each contiguous slice"""
+        sizes: Dict[Any, int] = {}
+        order: List[int] = []
+        if group_by == "tag":
+            rows = {track_id: row for row, track_id in enumerate(self._tracks)}
+            for tag_id, track_ids in self._tag_tracks.items():
+                tag_rows = [
+                    rows[track_id] for track_id in track_ids if track_id in rows
+                ]
+                sizes[tag_id] = len(tag_rows)
+                order.extend(tag_rows)
+        else:
+            codes: Dict[Any, int] = {}
+            row_codes = [
+                codes.setdefault(key, len(codes))
+                for key in track_column(self._tracks, group_by)
+            ]
+            counts = Counter(row_codes)
+            sizes = {key: counts[code] for key, code in codes.items()}
+            order = sorted(range(len(row_codes)), key=row_codes.__getitem__)
+
+        columns = {
+            column: list(map(values.__getitem__, order))
+            for column, values in self._columns.items()
+        }
+        result = {}
+        start = 0
+        for key, size in sizes.items():
+            result[key] = self._aggregate(columns, start, start + size)
+            start += size
+        return result
+
+    def _aggregate(
+        self, columns: Dict[str, List[float | None]], start: int, end: int
+    ) -> Dict[str, Any]:
+        """Aggregate the rows start..end of every column, skipping missing values"""
+        result: Dict[str, Any] = {"count": end - start}
+        for column, values in columns.items():
+            chunk = values[start:end]
+            if not self._complete[column]:
+                chunk = [value for value in chunk if value is not None]
+            count = len(chunk)
+            total = sum(chunk)  # type: ignore[arg-type]
+            result[column] = {
+                "count": count,
+                "sum": total,
+                "min": min(chunk) if count else None,  # type: ignore[type-var]
+                "max": max(chunk) if count else None,  # type: ignore[type-var]
+                "mean": total / count if count else None,
+            }
+        return result
+
+
+def _numbers(values: Sequence[Any]) -> List[float | None]:
+    """Get the values as numbers, where missing or invalid values become None"""
+    if set(map(type, values)) <= {int, float}:
+        return list(values)
+    return [
+        value if type(value) is int or type(value) is float else _number(value)
+        for value in values
+    ]
+
+
+def _number(value: Any) -> float | None:
+    """Convert a single value that is not an int or float already"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
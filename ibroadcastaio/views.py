@@ -0,0 +1,160 @@
+"""Precomputed filtered views on the iBroadcast track store."""
+
+import bisect
+import math
+from array import array
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Sequence
+
+
+class TrackView(Mapping[int, Dict[str, Any]]):
+    """Read-only mapping of a precomputed subset of the tracks, without copying them"""
+
+    def __init__(self, tracks: Mapping[int, Any], track_ids: Dict[int, None]) -> None:
+        """Wrap the track store and the ids in this view"""
+        self._tracks = tracks
+        self._track_ids = track_ids
+
+    def __getitem__(self, key: int) -> Dict[str, Any]:
+        if key not in self._track_ids:
+            raise KeyError(key)
+        return self._tracks[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._track_ids
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._track_ids)
+
+    def __len__(self) -> int:
+        return len(self._track_ids)
+
+
+class TrackViews:
+    """
+    The active (non-trashed) tracks, active tracks per type and the upload times.
+
+    Built once per library refresh, so every query only wraps or bisects the prepared ids.
+    """
+
+    def __init__(self, tracks: Mapping[int, Any]) -> None:
+        """Compute the id sets of every view in a single pass over the tracks"""
+        active: Dict[int, None] = {}
+        by_type: Dict[str, Dict[int, None]] = {}
+        uploads = []
+        upload_timestamps = track_column(tracks, "upload_timestamp")
+        for track_id, trashed, track_type, uploaded in zip(
+            tracks,
+            track_column(tracks, "trashed"),
+            track_column(tracks, "type"),
+            upload_timestamps,
+        ):
+            if trashed:
+                continue
+            active[track_id] = None
+            by_type.setdefault(track_type, {})[track_id] = None
+            if uploaded is not None:
+                uploads.append((uploaded, track_id))
+
+        uploads.sort()
+        self._tracks = tracks
+        self.active = TrackView(tracks, active)
+        self.by_type = {
+            track_type: TrackView(tracks, track_ids)
+            for track_type, track_ids in by_type.items()
+        }
+        # Upload timestamp of every track in iteration order, NaN when unknown
+        self.upload_timestamps = array(
+            "d",
+            [
+                math.nan if uploaded is None else uploaded
+                for uploaded in upload_timestamps
+            ],
+        )
+        self._upload_times = array("d", [uploaded for uploaded, _ in uploads])
+        self._upload_ids = array("q", [track_id for _, track_id in uploads])
+
+    def uploaded_between(
+        self, since: datetime, until: datetime | None = None
+    ) -> List[Dict[str, Any]]:
+        """Get the active tracks uploaded in [since, until), newest first, naive times are UTC"""
+        start = bisect.bisect_left(self._upload_times, _timestamp(since))
+        end = (
+            len(self._upload_times)
+            if until is None
+            else bisect.bisect_left(self._upload_times, _timestamp(until))
+        )
+        return [
+            self._tracks[self._upload_ids[row]] for row in range(end - 1, start - 1, -1)
+        ]
+
+
+def track_column(tracks: Mapping[int, Any], field: str) -> Sequence[Any]:
+    """
+    Get one field of every track in iteration order, None where missing.
+
+    The upload_timestamp field is derived from uploaded_on and uploaded_time. Memory-mapped
+    snapshots read their columns instead of decoding every row.
+    """
+    column = getattr(tracks, "column", None)
+    if column is None:
+        if field == "upload_timestamp":
+            return upload_timestamps(tracks.values())
+        return [track.get(field) for track in tracks.values()]
+
+    values = column(field)
+    if field == "upload_timestamp":
+        return [None if math.isnan(value) else value for value in values]
+    return values
+
+
+def upload_timestamps(tracks: Iterable[Dict[str, Any]]) -> List[float | None]:
+    """
+    Get the upload time of every track as UTC timestamp, or None when unknown.
+
+    Upload dates and times repeat a lot within a library, so each distinct value is parsed once.
+    """
+    days: Dict[Any, float | None] = {}
+    times: Dict[Any, float | None] = {}
+    result: List[float | None] = []
+    for track in tracks:
+        uploaded_on = track.get("uploaded_on")
+        uploaded_time = track.get("uploaded_time")
+        if uploaded_on not in days:
+            days[uploaded_on] = _day_timestamp(uploaded_on)
+        if uploaded_time not in times:
+            times[uploaded_time] = _seconds(uploaded_time)
+
+        day = days[uploaded_on]
+        seconds = times[uploaded_time]
+        result.append(None if day is None or seconds is None else day + seconds)
+    return result
+
+
+def _day_timestamp(value: Any) -> float | None:
+    """Get the UTC timestamp of midnight of an ISO date, or None when invalid"""
+    try:
+        day = date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return _timestamp(datetime(day.year, day.month, day.day))
+
+
+def _seconds(value: Any) -> float | None:
+    """Get the seconds since midnight UTC of an ISO time, or None when invalid"""
+    try:
+        moment = time.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    seconds = (
+        moment.hour * 3600 + moment.minute * 60 + moment.second
+    ) + moment.microsecond / 1_000_000
+    offset = moment.utcoffset()
+    return seconds if offset is None else seconds - offset.total_seconds()
+
+
+def _timestamp(moment: datetime) -> float:
+    """Get the timestamp of a datetime, where naive datetimes are UTC"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
@@ -0,0 +1,304 @@
+"""Local stand-in for the iBroadcast API, serving synthetic libraries."""
+
+import asyncio
+import json
+import random
+from typing import Any, Dict, List, Set
+
+from aiohttp import web
+
+from ibroadcastaio.const import STATUS_API
+
+TRACK_MAP = {
+    "track": 0,
+    "year": 1,
+    "title": 2,
+    "genre": 3,
+    "length": 4,
+    "album_id": 5,
+    "artwork_id": 6,
+    "artist_id": 7,
+    "enid": 8,
+    "uploaded_on": 9,
+    "trashed": 10,
+    "size": 11,
+    "path": 12,
+    "uid": 13,
+    "rating": 14,
+    "plays": 15,
+    "file": 16,
+    "type": 17,
+    "replay_gain": 18,
+    "uploaded_time": 19,
+    "artists_additional": 20,
+    "genres_additional": 21,
+    "icatid": 22,
+    "artists_additional_map": {"type": 2, "phrase": 1, "artist_id": 0},
+}
+ALBUM_MAP = {
+    "name": 0,
+    "tracks": 1,
+    "artist_id": 2,
+    "trashed": 3,
+    "rating": 4,
+    "disc": 5,
+    "year": 6,
+    "artists_additional": 7,
+    "icatid": 8,
+    "artists_additional_map": {"type": 2, "artist_id": 0, "phrase": 1},
+}
+ARTIST_MAP = {
+    "name": 0,
+    "tracks": 1,
+    "trashed": 2,
+    "rating": 3,
+    "artwork_id": 4,
+    "icatid": 5,
+}
+PLAYLIST_MAP = {
+    "name": 0,
+    "tracks": 1,
+    "uid": 2,
+    "system_created": 3,
+    "public_id": 4,
+    "type": 5,
+    "description": 6,
+    "artwork_id": 7,
+    "sort": 8,
+}
+GENRES = ("Rock", "Pop", "Jazz", "Classical", "Hip-Hop", "Electronic", "Folk", "Metal")
+TYPES = ("audio/mpeg", "audio/mp4", "audio/flac")
+
+TRACKS_PER_ALBUM = 12
+ALBUMS_PER_ARTIST = 3
+CHUNK_SIZE = 16 * 1024
+
+
+def build_library(track_count: int, seed: int = 0) -> Dict[str, Any]:
+    """Build a synthetic library in the iBroadcast JSON format"""
+    rng = random.Random(seed)
+    album_count = max(1, -(-track_count // TRACKS_PER_ALBUM))
+    artist_count = max(1, -(-album_count // ALBUMS_PER_ARTIST))
+
+    tracks: Dict[str, Any] = {"map": TRACK_MAP}
+    albums: Dict[str, Any] = {"map": ALBUM_MAP}
+    artists: Dict[str, Any] = {"map": ARTIST_MAP}
+    for artist in range(artist_count):
+        artists[str(20_000_000 + artist)] = [f"Artist {artist}", [], False, 0, None, ""]
+    for album in range(album_count):
+        artist_id = 20_000_000 + album // ALBUMS_PER_ARTIST
+        albums[str(10_000_000 + album)] = [
+            f"Album {album}",
+            [],
+            artist_id,
+            False,
+            0,
+            1,
+            1960 + rng.randrange(60),
+            [],
+            "",
+        ]
+
+    for index in range(track_count):
+        track_id = 1_000_000 + index
+        album = index // TRACKS_PER_ALBUM
+        album_id = 10_000_000 + album
+        artist_id = 20_000_000 + album // ALBUMS_PER_ARTIST
+        tracks[str(track_id)] = [
+            index % TRACKS_PER_ALBUM + 1,
+            albums[str(album_id)][6],
+            f"Track {index}",
+            rng.choice(GENRES),
+            rng.randrange(90, 480),
+            album_id,
+            30_000_000 + album,
+            artist_id,
+            0,
+            f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+            rng.random() < 0.01,
+            rng.randrange(2_000_000, 15_000_000),
+            f"Music/Artist {album // ALBUMS_PER_ARTIST}/Album {album}",
+            "",
+            rng.randrange(6),
+            rng.randrange(200),
+            f"/128/{track_id}",
+            rng.choice(TYPES),
+            "-6",
+            f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}",
+            [],
+            [],
+            "",
+        ]
+        albums[str(album_id)][1].append(track_id)
+        artists[str(artist_id)][1].append(track_id)
+
+    track_ids = [1_000_000 + index for index in range(track_count)]
+    playlists = {
+        "map": PLAYLIST_MAP,
+        "1": ["All tracks", track_ids, 1, False, None, None, None, None, 0],
+        "2": [
+            "Random picks",
+            rng.sample(track_ids, min(100, track_count)),
+            1,
+            False,
+            None,
+            None,
+            None,
+            None,
+            1,
+        ],
+    }
+    tags = {
+        "1": {"name": "Favorites", "archived": False, "tracks": track_ids[::7]},
+    }
+
+    return {
+        "result": True,
+        "library": {
+            "tracks": tracks,
+            "albums": albums,
+            "artists": artists,
+            "playlists": playlists,
+            "tags": tags,
+            "trash": {"map": {"name": 0, "tracks": 1}},
+            "expires": 0,
+        },
+        "settings": {},
+        "status": {},
+    }
+
+
+class FakeIBroadcastServer:
+    """
+    aiohttp server for the status, library, artwork and streaming endpoints.
+
+    Every request waits latency seconds, fails with a 503 at error_rate and, when bandwidth
+    (bytes per second) is set, sends its body in throttled chunks. The server records request
+    counts, body sizes, headers, distinct connections and the peak number of concurrent requests.
+    """
+
+    def __init__(
+        self,
+        track_count: int = 1000,
+        latency: float = 0.0,
+        bandwidth: int | None = None,
+        error_rate: float = 0.0,
+        stream_size: int = 256 * 1024,
+        seed: int = 0,
+    ) -> None:
+        """Configure the server, the library is built on start"""
+        self.track_count = track_count
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.stream_size = stream_size
+        self.url = ""
+
+        self.requests: Dict[str, int] = {}
+        self.request_bytes: List[int] = []
+        self.headers: List[Dict[str, str]] = []
+        self.connections: Set[Any] = set()
+        self.max_concurrency = 0
+
+        self._seed = seed
+        self._random = random.Random(seed)
+        self._tokens: Set[str] = set()
+        self._concurrency = 0
+        self._library = b""
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> str:
+        """Start listening on a free local port and return the base URL"""
+        app = web.Application()
+        app.router.add_post(STATUS_API, self._status)
+        app.router.add_post("/", self._library_handler)
+        app.router.add_get("/artwork/{artwork}", self._artwork)
+        app.router.add_get("/stream/{path:.*}", self._stream)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+        library = build_library(self.track_count, self._seed)
+        library["settings"] = {
+            "artwork_server": self.url,
+            "streaming_server": f"{self.url}/stream",
+        }
+        self._library = json.dumps(library).encode()
+        return self.url
+
+    async def close(self) -> None:
+        """Stop the server"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def expire_tokens(self) -> None:
+        """Reject all tokens handed out so far"""
+        self._tokens.clear()
+
+    async def _status(self, request: web.Request) -> web.StreamResponse:
+        data = await request.json()
+        if data.get("password") == "wrong":
+            body = {"result": False, "authenticated": False, "message": "Invalid login"}
+        else:
+            token = f"token-{len(self._tokens)}-{self._random.getrandbits(32)}"
+            self._tokens.add(token)
+            body = {
+                "result": True,
+                "authenticated": True,
+                "user": {"token": token, "id": 1},
+                "settings": {},
+            }
+        return await self._serve(request, json.dumps(body).encode(), "application/json")
+
+    async def _library_handler(self, request: web.Request) -> web.StreamResponse:
+        data = await request.json()
+        if data.get("_token") in self._tokens:
+            body = self._library
+        else:
+            body = json.dumps({"result": False, "authenticated": False}).encode()
+        return await self._serve(request, body, "application/json")
+
+    async def _artwork(self, request: web.Request) -> web.StreamResponse:
+        return await self._serve(request, b"\xff" * 4096, "image/jpeg")
+
+    async def _stream(self, request: web.Request) -> web.StreamResponse:
+        if request.query.get("Signature") not in self._tokens:
+            raise web.HTTPUnauthorized()
+        return await self._serve(request, b"\0" * self.stream_size, "audio/mpeg")
+
+    async def _serve(
+        self, request: web.Request, body: bytes, content_type: str
+    ) -> web.StreamResponse:
+        """Record the request and send body with the configured faults"""
+        self.requests[request.path] = self.requests.get(request.path, 0) + 1
+        self.request_bytes.append(len(await request.read()))
+        self.headers.append(dict(request.headers))
+        self.connections.add(request.transport)
+        self._concurrency += 1
+        self.max_concurrency = max(self.max_concurrency, self._concurrency)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self._random.random() < self.error_rate:
+                raise web.HTTPServiceUnavailable()
+
+            response = web.StreamResponse(headers={"Content-Type": content_type})
+            response.content_length = len(body)
+            await response.prepare(request)
+            if not self.bandwidth:
+                await response.write(body)
+            else:
+                for start in range(0, len(body), CHUNK_SIZE):
+                    end = start + CHUNK_SIZE
+                    chunk = body[start:end]
+                    await response.write(chunk)
+                    await asyncio.sleep(len(chunk) / self.bandwidth)
+            await response.write_eof()
+            return response
+        finally:
+            self._concurrency -= 1
@@ -0,0 +1,111 @@
+"""
+Load test: many concurrent clients refreshing their library from the fake server.
+
+Run with, for example:
+
+    poetry run python -m tests.load_test --clients 50 --rounds 5 --tracks 20000 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession
+
+from ibroadcastaio import IBroadcastClient
+from tests.fake_server import FakeIBroadcastServer
+
+
+async def run_load_test(
+    clients: int = 20,
+    rounds: int = 5,
+    track_count: int = 5000,
+    latency: float = 0.0,
+    bandwidth: int | None = None,
+    error_rate: float = 0.0,
+) -> Dict[str, Any]:
+    """Let every client login and refresh its library rounds times, then report timings"""
+    server = FakeIBroadcastServer(track_count, latency, bandwidth, error_rate)
+    url = await server.start()
+    durations: List[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        # Every client has its own session, like separate worker processes would
+        async with ClientSession() as session:
+            client = IBroadcastClient(session, api_url=url, library_url=f"{url}/")
+            try:
+                await client.login("load@example.com", "password")
+            except ValueError:
+                errors += rounds
+                return
+            for _ in range(rounds):
+                start = time.perf_counter()
+                try:
+                    await client.refresh_library()
+                except Exception:
+                    errors += 1
+                    continue
+                durations.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(clients)))
+    finally:
+        await server.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "refreshes": len(durations),
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(durations) / elapsed,
+        "p50": _percentile(durations, 0.50),
+        "p95": _percentile(durations, 0.95),
+        "p99": _percentile(durations, 0.99),
+        "max": max(durations, default=0.0),
+        "requests": sum(server.requests.values()),
+        "connections": len(server.connections),
+        "max_concurrency": server.max_concurrency,
+        "max_request_bytes": max(server.request_bytes, default=0),
+    }
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Get the nearest-rank percentile of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def main() -> None:
+    """Run the load test with command line options and print the report as JSON"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--bandwidth", type=int, default=None, help="bytes per second")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run_load_test(
+            args.clients,
+            args.rounds,
+            args.tracks,
+            args.latency,
+            args.bandwidth,
+            args.error_rate,
+        )
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
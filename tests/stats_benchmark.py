@@ -0,0 +1,135 @@
+"""
+Benchmark: get_track_statistics against a naive loop over get_tracks.
+
+Run with, for example:
+
+    poetry run python -m tests.stats_benchmark --tracks 20000 --group-by album_id
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping
+
+from aiohttp import ClientSession
+
+from ibroadcastaio import IBroadcastClient
+from ibroadcastaio.stats import STAT_COLUMNS, TrackStatistics
+from ibroadcastaio.views import upload_timestamps
+from tests.fake_server import FakeIBroadcastServer
+
+
+async def run_stats_benchmark(
+    track_count: int = 20000, group_by: str | None = "album_id", repeat: int = 3
+) -> Dict[str, Any]:
+    """Time both approaches on a fresh library, best of repeat runs each, and report them"""
+    server = FakeIBroadcastServer(track_count)
+    url = await server.start()
+    try:
+        async with ClientSession() as session:
+            client = IBroadcastClient(session, api_url=url, library_url=f"{url}/")
+            await client.login("bench@example.com", "password")
+            await client.refresh_library()
+            tracks = await client.get_tracks()
+            tags = await client.get_tags()
+
+            statistics: Dict[Any, Any] = {}
+            statistics_time = naive_time = float("inf")
+            for _ in range(repeat):
+                # Parse the upload times as well, which refresh_library does for the client
+                start = time.perf_counter()
+                uploaded = array(
+                    "d",
+                    [
+                        math.nan if timestamp is None else timestamp
+                        for timestamp in upload_timestamps(tracks.values())
+                    ],
+                )
+                statistics = TrackStatistics(tracks, tags, uploaded, 0).summary(
+                    group_by
+                )
+                statistics_time = min(statistics_time, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                naive = naive_statistics(tracks, group_by)
+                naive_time = min(naive_time, time.perf_counter() - start)
+    finally:
+        await server.close()
+
+    if group_by is None:
+        statistics, naive = {None: statistics}, {None: naive}
+    return {
+        "tracks": len(tracks),
+        "groups": len(statistics),
+        "statistics": statistics_time,
+        "naive": naive_time,
+        "speedup": naive_time / statistics_time,
+        "equal": statistics == naive,
+    }
+
+
+def naive_statistics(tracks: Mapping[int, Any], group_by: str | None) -> Dict[Any, Any]:
+    """Collect the values of every group track by track, then aggregate each list"""
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for track in tracks.values():
+        key = track.get(group_by) if group_by is not None else None
+        group = groups.setdefault(key, {"count": 0, "values": {}})
+        group["count"] += 1
+        for column in STAT_COLUMNS:
+            value = _naive_value(track, column)
+            if value is not None:
+                group["values"].setdefault(column, []).append(value)
+
+    result = {}
+    for key, group in groups.items():
+        result[key] = {"count": group["count"]}
+        for column in STAT_COLUMNS:
+            values: List[float] = group["values"].get(column, [])
+            total = sum(values)
+            result[key][column] = {
+                "count": len(values),
+                "sum": total,
+                "min": min(values) if values else None,
+                "max": max(values) if values else None,
+                "mean": total / len(values) if values else None,
+            }
+    return result if group_by is not None else result.get(None, {})
+
+
+def _naive_value(track: Dict[str, Any], column: str) -> float | None:
+    """Get a numeric value of a track, parsing the upload time per track"""
+    if column == "uploaded_time":
+        try:
+            uploaded = datetime.fromisoformat(
+                f'{track.get("uploaded_on")}T{track.get("uploaded_time")}'
+            )
+        except ValueError:
+            return None
+        return uploaded.replace(tzinfo=timezone.utc).timestamp()
+    value = track.get(column)
+    return value if isinstance(value, (int, float)) else None
+
+
+def main() -> None:
+    """Run the benchmark with command line options and print the report as JSON"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tracks", type=int, default=20000)
+    parser.add_argument(
+        "--group-by",
+        default="album_id",
+        choices=("none", "artist_id", "album_id", "genre", "year"),
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    group_by = None if args.group_by == "none" else args.group_by
+    report = asyncio.run(run_stats_benchmark(args.tracks, group_by, args.repeat))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
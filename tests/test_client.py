@@ -1,10 +1,17 @@
 import json
+import os
+import tempfile
 import unittest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, Mock, patch
 
-from aiohttp import ClientSession
+from aiohttp import ClientResponseError, ClientSession
 
 from ibroadcastaio.client import IBroadcastClient
+from ibroadcastaio.const import INTERNED_FIELDS
+from ibroadcastaio.memory import InternPool
+from ibroadcastaio.snapshot import LibrarySnapshot, SnapshotStore
+from tests.fake_server import build_library
 
 
 class TestIBroadcastClient(unittest.IsolatedAsyncioTestCase):
@@ -527,6 +534,503 @@ class TestIBroadcastClient(unittest.IsolatedAsyncioTestCase):
         self.assertIn("file_id=42", result)
         self.assertIn("user_id=fake_id", result)
 
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_get_resolved_playlist(self, mock_post: Mock) -> None:
+        mock_library = await self._load_raw_mock_library()
+        # Trash the second track of the playlist
+        mock_library["library"]["tracks"]["357343236"][10] = True
+        mock_post.return_value = mock_library
+
+        await self.client.refresh_library()
+        resolved = await self.client.get_resolved_playlist(1234)
+
+        self.assertEqual(resolved["total"], 5)
+        self.assertEqual(resolved["duration"], 194 + 240 + 213 + 226 + 293)
+        self.assertEqual(resolved["artwork_id"], 530142)
+        self.assertNotIn(357343236, [t["track_id"] for t in resolved["tracks"]])
+
+        page = await self.client.get_resolved_playlist(1234, offset=1, limit=2)
+        self.assertEqual(
+            [t["track_id"] for t in page["tracks"]], [357343241, 357343244]
+        )
+        self.assertEqual(page["total"], 5)
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_get_resolved_playlist_not_found(self, mock_post: Mock) -> None:
+        mock_post.return_value = await self._load_raw_mock_library()
+
+        await self.client.refresh_library()
+        with self.assertRaises(ValueError):
+            await self.client.get_resolved_playlist(999)
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_get_resolved_playlist_negative_paging(self, mock_post: Mock) -> None:
+        mock_post.return_value = await self._load_raw_mock_library()
+
+        await self.client.refresh_library()
+        with self.assertRaises(ValueError):
+            await self.client.get_resolved_playlist(1234, offset=-2)
+        with self.assertRaises(ValueError):
+            await self.client.get_resolved_playlist(1234, limit=-1)
+
+        page = await self.client.get_resolved_playlist(1234, offset=10, limit=0)
+        self.assertEqual(page["tracks"], [])
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_resolved_playlist_cache_invalidation(self, mock_post: Mock) -> None:
+        mock_post.return_value = await self._load_raw_mock_library()
+        await self.client.refresh_library()
+        await self.client.get_resolved_playlist(1234)
+        cached = self.client._resolved_playlists[1234]
+
+        # Unchanged library keeps the resolution
+        mock_post.return_value = await self._load_raw_mock_library()
+        await self.client.refresh_library()
+        self.assertIs(self.client._resolved_playlists[1234], cached)
+
+        # A changed track of the playlist drops it
+        mock_library = await self._load_raw_mock_library()
+        mock_library["library"]["tracks"]["357343232"][4] = 100
+        mock_post.return_value = mock_library
+        await self.client.refresh_library()
+        self.assertNotIn(1234, self.client._resolved_playlists)
+
+        resolved = await self.client.get_resolved_playlist(1234)
+        self.assertEqual(resolved["duration"], 100 + 247 + 240 + 213 + 226 + 293)
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_library_snapshot(self, mock_post: Mock) -> None:
+        mock_post.return_value = await self._load_raw_mock_library()
+        await self.client.refresh_library()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.snapshot")
+            await self.client.export_library_snapshot(path)
+
+            other = IBroadcastClient(self.session)
+            await other.attach_library_snapshot(path)
+
+            self.assertEqual(
+                await other.get_settings(), await self.client.get_settings()
+            )
+            for name in ("albums", "artists", "playlists", "tags", "tracks"):
+                expected = await getattr(self.client, f"get_{name}")()
+                attached = await getattr(other, f"get_{name}")()
+                self.assertEqual(dict(attached), dict(expected))
+
+            track_id = next(iter(await self.client.get_tracks()))
+            self.assertEqual(
+                await other.get_track(track_id), await self.client.get_track(track_id)
+            )
+            self.assertEqual(await other.get_track(1), {})
+            self.assertEqual(
+                await other.get_resolved_playlist(1234),
+                await self.client.get_resolved_playlist(1234),
+            )
+
+            # Mappings handed out before a refresh stay usable
+            attached_tracks = await other.get_tracks()
+            other._status = self.client._status
+            await other.refresh_library()
+            self.assertEqual(dict(attached_tracks), dict(await other.get_tracks()))
+
+            snapshot = LibrarySnapshot(path)
+            snapshot.close()
+            with self.assertRaisesRegex(ValueError, "closed"):
+                snapshot.stores["tracks"][track_id]
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_attach_library_snapshot_without_decoding_rows(
+        self, mock_post: Mock
+    ) -> None:
+        mock_library = await self._load_raw_mock_library()
+        mock_library["library"]["tracks"]["357343236"][10] = True
+        mock_post.return_value = mock_library
+        await self.client.refresh_library()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.snapshot")
+            await self.client.export_library_snapshot(path)
+
+            other = IBroadcastClient(self.session)
+            with patch.object(
+                SnapshotStore, "__getitem__", side_effect=AssertionError("decoded")
+            ):
+                await other.attach_library_snapshot(path)
+
+            self.assertEqual(
+                list(await other.get_tracks(include_trashed=False)),
+                list(await self.client.get_tracks(include_trashed=False)),
+            )
+            self.assertEqual(
+                list(await other.get_tracks_by_type("audio/mpeg")),
+                list(await self.client.get_tracks_by_type("audio/mpeg")),
+            )
+            since = datetime(2023, 12, 24, 13, 28, 30)
+            self.assertEqual(
+                await other.get_recent_tracks(since),
+                await self.client.get_recent_tracks(since),
+            )
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_export_library_snapshot_failure(self, mock_post: Mock) -> None:
+        mock_post.return_value = await self._load_raw_mock_library()
+        await self.client.refresh_library()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.snapshot")
+            with patch("os.replace", side_effect=OSError("No space left on device")):
+                with self.assertRaises(OSError):
+                    await self.client.export_library_snapshot(path)
+            self.assertEqual(os.listdir(directory), [])
+
+    async def test_attach_library_snapshot_invalid_file(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.snapshot")
+            with open(path, "wb") as file:
+                file.write(b"not a snapshot at all")
+            with self.assertRaises(ValueError):
+                await self.client.attach_library_snapshot(path)
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_get_track_statistics(self, mock_post: Mock) -> None:
+        mock_post.return_value = await self._load_raw_mock_library()
+        await self.client.refresh_library()
+        tracks = await self.client.get_tracks()
+
+        summary = await self.client.get_track_statistics()
+        self.assertEqual(summary["count"], len(tracks))
+        self.assertEqual(
+            summary["length"]["sum"], sum(t["length"] for t in tracks.values())
+        )
+        self.assertEqual(
+            summary["size"]["max"], max(t["size"] for t in tracks.values())
+        )
+
+        by_album = await self.client.get_track_statistics("album_id")
+        self.assertEqual(
+            sum(group["count"] for group in by_album.values()), len(tracks)
+        )
+        self.assertEqual(by_album[167310559]["year"]["mean"], 1990)
+
+        by_tag = await self.client.get_track_statistics("tag")
+        self.assertEqual(by_tag[123]["count"], 1)
+        self.assertEqual(by_tag[123]["length"]["sum"], 194)
+
+        # Cached until the library is refreshed
+        self.assertIs(await self.client.get_track_statistics("album_id"), by_album)
+        await self.client.refresh_library()
+        self.assertIsNot(await self.client.get_track_statistics("album_id"), by_album)
+
+        with self.assertRaises(ValueError):
+            await self.client.get_track_statistics("title")
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_export_and_resume_session(self, mock_post: Mock) -> None:
+        mock_post.return_value = {
+            "user": {"token": "fake_token", "id": "fake_id"},
+            "settings": {"fast_polling": 10},
+        }
+        await self.client.login("test@example.com", "password")
+        session = self.client.export_session()
+        self.assertEqual(session["token"], "fake_token")
+        self.assertEqual(session["user_id"], "fake_id")
+
+        mock_post.reset_mock()
+        mock_post.return_value = await self._load_raw_mock_library()
+        other = IBroadcastClient(self.session)
+        other.resume_session(session)
+        mock_post.assert_not_awaited()
+
+        await other.refresh_library()
+        mock_post.assert_awaited_once()
+        payload = mock_post.await_args.args[2]
+        self.assertEqual(payload["_token"], "fake_token")
+        self.assertEqual(payload["_userid"], "fake_id")
+
+    def test_export_session_not_logged_in(self) -> None:
+        self.client._status = {}
+        with self.assertRaises(ValueError):
+            self.client.export_session()
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_resume_session_relogin_on_auth_failure(
+        self, mock_post: Mock
+    ) -> None:
+        mock_post.side_effect = [
+            {"result": False, "authenticated": False},
+            {"user": {"token": "new_token", "id": "fake_id"}},
+            await self._load_raw_mock_library(),
+        ]
+        self.client.resume_session(
+            {"token": "expired", "user_id": "fake_id"}, "test@example.com", "password"
+        )
+
+        await self.client.refresh_library()
+
+        self.assertEqual(mock_post.await_count, 3)
+        self.assertEqual(mock_post.await_args.args[2]["_token"], "new_token")
+        self.assertGreater(len(await self.client.get_tracks()), 0)
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_resume_session_auth_failure_without_credentials(
+        self, mock_post: Mock
+    ) -> None:
+        mock_post.return_value = {"result": False, "authenticated": False}
+        self.client.resume_session({"token": "expired", "user_id": "fake_id"})
+
+        with self.assertRaises(ValueError):
+            await self.client.refresh_library()
+        mock_post.assert_awaited_once()
+
+        # The rejected HTTP status is kept as the cause
+        mock_post.side_effect = ClientResponseError(Mock(), (), status=401)
+        with self.assertRaises(ValueError) as ctx:
+            await self.client.refresh_library()
+        cause = ctx.exception.__cause__
+        assert isinstance(cause, ClientResponseError)
+        self.assertEqual(cause.status, 401)
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_track_views(self, mock_post: Mock) -> None:
+        mock_library = await self._load_raw_mock_library()
+        # Trash an audio/mpeg track and the most recent upload
+        mock_library["library"]["tracks"]["357343236"][10] = True
+        mock_library["library"]["tracks"]["357343301"][10] = True
+        mock_post.return_value = mock_library
+        await self.client.refresh_library()
+
+        tracks = await self.client.get_tracks()
+        active = await self.client.get_tracks(include_trashed=False)
+        self.assertEqual(len(active), len(tracks) - 2)
+        self.assertNotIn(357343236, active)
+        self.assertEqual(active[357343232], tracks[357343232])
+        self.assertEqual(
+            dict(active), {k: v for k, v in tracks.items() if not v["trashed"]}
+        )
+
+        mpeg = await self.client.get_tracks_by_type("audio/mpeg")
+        self.assertEqual(list(mpeg), [357343244])
+        self.assertEqual(len(await self.client.get_tracks_by_type("audio/flac")), 0)
+
+        recent = await self.client.get_recent_tracks(datetime(2023, 12, 24, 13, 28, 37))
+        self.assertEqual([t["track_id"] for t in recent], [357343298, 357343284])
+        window = await self.client.get_recent_tracks(
+            datetime(2023, 12, 24, 13, 28, 7), datetime(2023, 12, 24, 13, 28, 13)
+        )
+        self.assertEqual([t["track_id"] for t in window], [357343241, 357343232])
+
+        # Naive datetimes are UTC, aware ones are converted
+        amsterdam = timezone(timedelta(hours=1))
+        self.assertEqual(
+            await self.client.get_recent_tracks(
+                datetime(2023, 12, 24, 14, 28, 37, tzinfo=amsterdam)
+            ),
+            recent,
+        )
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_random_tracks(self, mock_post: Mock) -> None:
+        mock_library = await self._load_raw_mock_library()
+        mock_library["library"]["tracks"]["357343236"][10] = True
+        # Only one track has plays, so it dominates the plays weighted picks
+        mock_library["library"]["tracks"]["357343232"][15] = 10000
+        mock_post.return_value = mock_library
+        await self.client.refresh_library()
+        active = await self.client.get_tracks(include_trashed=False)
+
+        track = await self.client.get_random_track()
+        self.assertIn(track["track_id"], active)
+
+        picks = await self.client.get_random_tracks(200, weight="plays")
+        self.assertEqual(len(picks), 200)
+        self.assertNotIn(357343236, [t["track_id"] for t in picks])
+        self.assertGreater(sum(1 for t in picks if t["track_id"] == 357343232), 150)
+
+        with self.assertRaises(ValueError):
+            await self.client.get_random_track(weight="size")
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_shuffled_tracks(self, mock_post: Mock) -> None:
+        mock_library = await self._load_raw_mock_library()
+        mock_library["library"]["tracks"]["357343236"][10] = True
+        mock_post.return_value = mock_library
+        await self.client.refresh_library()
+
+        queue = [t["track_id"] for t in await self.client.get_shuffled_tracks()]
+        active = await self.client.get_tracks(include_trashed=False)
+        self.assertEqual(sorted(queue), sorted(active))
+
+        playlist = await self.client.get_playlist(1234)
+        queue = [
+            t["track_id"]
+            for t in await self.client.get_shuffled_tracks("playlist", 1234)
+        ]
+        self.assertEqual(sorted(queue), sorted(set(playlist["tracks"]) - {357343236}))
+
+        genre = [t for t in await self.client.get_shuffled_tracks("genre", "Rock")]
+        self.assertEqual(len(genre), len(active))
+
+        with self.assertRaises(ValueError):
+            await self.client.get_shuffled_tracks("album", 1)
+        with self.assertRaises(ValueError):
+            await self.client.get_shuffled_tracks("year", 1990)
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_get_memory_usage(self, mock_post: Mock) -> None:
+        mock_post.return_value = await self._load_raw_mock_library()
+        await self.client.refresh_library()
+        await self.client.get_resolved_playlist(1234)
+
+        usage = await self.client.get_memory_usage(sample_size=None)
+        tracks = await self.client.get_tracks()
+        self.assertEqual(usage["tracks"]["count"], len(tracks))
+        self.assertFalse(usage["tracks"]["estimated"])
+        self.assertGreater(usage["tracks"]["bytes"], usage["tracks"]["fields"]["title"])
+        self.assertIn("title", usage["tracks"]["fields"])
+        self.assertGreater(usage["indexes"]["track_views"]["bytes"], 0)
+        self.assertGreater(usage["indexes"]["resolved_playlists"]["bytes"], 0)
+        self.assertEqual(usage["snapshot_bytes"], 0)
+        self.assertEqual(
+            usage["total_bytes"],
+            sum(usage[name]["bytes"] for name in ("albums", "artists", "playlists"))
+            + usage["tags"]["bytes"]
+            + usage["tracks"]["bytes"]
+            + usage["settings"]["bytes"]
+            + sum(index["bytes"] for index in usage["indexes"].values()),
+        )
+
+        sampled = await self.client.get_memory_usage(sample_size=2)
+        self.assertTrue(sampled["tracks"]["estimated"])
+        self.assertEqual(sampled["tracks"]["count"], len(tracks))
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_get_memory_usage_of_interned_fields(self, mock_post: Mock) -> None:
+        library = build_library(2000)
+        library["settings"] = {"artwork_server": "https://artwork.example.com"}
+        mock_post.return_value = library
+        await self.client.refresh_library()
+
+        full = await self.client.get_memory_usage(sample_size=None)
+        sampled = await self.client.get_memory_usage(sample_size=200)
+        for usage in (full, sampled):
+            # Three shared type strings cost far less than 2000 unique titles
+            fields = usage["tracks"]["fields"]
+            self.assertLess(fields.get("type", 0) * 10, fields["title"])
+
+        self.assertAlmostEqual(
+            sampled["tracks"]["bytes"] / full["tracks"]["bytes"], 1, delta=0.1
+        )
+
+        # A snapshot is not interned, the pool counts of the refresh are outdated
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.snapshot")
+            await self.client.export_library_snapshot(path)
+            await self.client.attach_library_snapshot(path)
+            usage = await self.client.get_memory_usage()
+            self.assertEqual(usage["interning"], {})
+
+    @patch(
+        "ibroadcastaio.client.IBroadcastClient._IBroadcastClient__post",
+        new_callable=AsyncMock,
+    )
+    async def test_refresh_library_interning(self, mock_post: Mock) -> None:
+        mock_post.return_value = await self._load_raw_mock_library()
+        await self.client.refresh_library()
+
+        # Interning keeps the results equal to a plain decode
+        for name, key in (
+            ("albums", "album_id"),
+            ("artists", "artist_id"),
+            ("playlists", "playlist_id"),
+            ("tracks", "track_id"),
+        ):
+            expected = await self._load_mock_library_section(name, key)
+            self.assertEqual(
+                dict(await getattr(self.client, f"get_{name}")()), expected
+            )
+        raw_tags = (await self._load_raw_mock_library())["library"]["tags"]
+        self.assertEqual(
+            await self.client.get_tags(),
+            {int(k): {**tag, "tag_id": int(k)} for k, tag in raw_tags.items()},
+        )
+
+        first, second = list((await self.client.get_tracks()).values())[:2]
+        self.assertIs(first["genre"], second["genre"])
+        self.assertIs(first["path"], second["path"])
+        self.assertEqual(first["genres_additional"], [])
+
+        # Lists are never shared, so changing one row leaves the others alone
+        first["genres_additional"].append("Jazz")
+        self.assertEqual(second["genres_additional"], [])
+        first["genres_additional"].pop()
+
+        # The unique main key of a store is not pooled
+        pool = InternPool(INTERNED_FIELDS)
+        self.assertEqual(
+            pool.candidates(["album_id", "name", "artist_id"], "album_id"),
+            ("artist_id",),
+        )
+
+        usage = await self.client.get_memory_usage()
+        self.assertGreater(usage["interning"]["deduplicated"], 0)
+        self.assertGreater(usage["interning"]["bytes_saved"], 0)
+
+    async def _load_mock_library_section(self, name: str, identifier: str) -> dict:
+        data = (await self._load_raw_mock_library())["library"][name]
+        result = {}
+        async for item in self.client._IBroadcastClient__json_to_dict(data, identifier):  # type: ignore
+            result[item[identifier]] = item
+        return result
+
 
 if __name__ == "__main__":
     unittest.main()
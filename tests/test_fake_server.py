@@ -0,0 +1,108 @@
+import unittest
+
+from aiohttp import ClientResponseError, ClientSession
+
+from ibroadcastaio.client import IBroadcastClient
+from tests.fake_server import FakeIBroadcastServer
+from tests.load_test import run_load_test
+
+
+class TestFakeServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.server = FakeIBroadcastServer(track_count=250)
+        url = await self.server.start()
+        self.session = ClientSession()
+        self.client = IBroadcastClient(self.session, api_url=url, library_url=f"{url}/")
+
+    async def asyncTearDown(self) -> None:
+        await self.session.close()
+        await self.server.close()
+
+    async def test_login_and_refresh_library(self) -> None:
+        await self.client.login("test@example.com", "password")
+        await self.client.refresh_library()
+        await self.client.refresh_library()
+
+        tracks = await self.client.get_tracks()
+        self.assertEqual(len(tracks), 250)
+        self.assertEqual(len(await self.client.get_albums()), 21)
+        self.assertEqual(self.server.requests, {"/s/JSON/status": 1, "/": 2})
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertTrue(
+            all("application/json" in h["Content-Type"] for h in self.server.headers)
+        )
+        self.assertLess(max(self.server.request_bytes), 1024)
+
+    async def test_request_metrics(self) -> None:
+        await self.client.login("test@example.com", "password")
+        await self.client.refresh_library()
+
+        metrics = await self.client.get_request_metrics()
+        self.assertEqual(metrics["interactive"]["completed"], 1)
+        self.assertEqual(metrics["background"]["completed"], 1)
+        self.assertEqual(metrics["in_flight"], 0)
+
+        self.server.error_rate = 1.0
+        with self.assertRaises(ClientResponseError):
+            await self.client.refresh_library()
+        metrics = await self.client.get_request_metrics()
+        self.assertEqual(metrics["throttled"], 1)
+        self.assertLess(metrics["limit"], 4)
+
+    async def test_login_failure(self) -> None:
+        with self.assertRaises(ValueError):
+            await self.client.login("test@example.com", "wrong")
+
+    async def test_relogin_after_token_expiry(self) -> None:
+        await self.client.login("test@example.com", "password")
+        self.server.expire_tokens()
+
+        await self.client.refresh_library()
+
+        self.assertEqual(self.server.requests["/s/JSON/status"], 2)
+        self.assertEqual(len(await self.client.get_tracks()), 250)
+
+    async def test_injected_errors(self) -> None:
+        await self.client.login("test@example.com", "password")
+        self.server.error_rate = 1.0
+
+        with self.assertRaises(ClientResponseError) as ctx:
+            await self.client.refresh_library()
+        self.assertEqual(ctx.exception.status, 503)
+
+    async def test_stream_and_artwork(self) -> None:
+        await self.client.login("test@example.com", "password")
+        await self.client.refresh_library()
+        track_id = next(iter(await self.client.get_tracks()))
+
+        async with self.session.get(
+            await self.client.get_full_stream_url(track_id)
+        ) as response:
+            self.assertEqual(len(await response.read()), self.server.stream_size)
+
+        async with self.session.get(
+            await self.client.get_track_artwork_url(track_id)
+        ) as response:
+            self.assertEqual(response.status, 200)
+
+    async def test_bandwidth_limit(self) -> None:
+        self.server.bandwidth = 10 * 1024 * 1024
+        await self.client.login("test@example.com", "password")
+        await self.client.refresh_library()
+        self.assertEqual(len(await self.client.get_tracks()), 250)
+
+
+class TestLoadTest(unittest.IsolatedAsyncioTestCase):
+    async def test_run_load_test(self) -> None:
+        report = await run_load_test(clients=5, rounds=2, track_count=100, latency=0.01)
+
+        self.assertEqual(report["refreshes"], 10)
+        self.assertEqual(report["errors"], 0)
+        self.assertEqual(report["requests"], 15)
+        self.assertEqual(report["connections"], 5)
+        self.assertGreater(report["max_concurrency"], 1)
+        self.assertGreaterEqual(report["p99"], report["p50"])
+
+
+if __name__ == "__main__":
+    unittest.main()
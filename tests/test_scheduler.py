@@ -0,0 +1,208 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from aiohttp import ClientResponseError, ServerTimeoutError
+
+from ibroadcastaio.scheduler import Priority, RequestScheduler
+
+
+class TestRequestScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_priority_order(self) -> None:
+        scheduler = RequestScheduler(initial_limit=1, max_limit=1)
+        gate = asyncio.Event()
+        order = []
+
+        async def blocker() -> None:
+            await gate.wait()
+
+        async def call(name: str) -> str:
+            order.append(name)
+            return name
+
+        first = asyncio.create_task(scheduler.run(Priority.BACKGROUND, blocker))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(scheduler.run(Priority.BACKGROUND, lambda: call("b1"))),
+            asyncio.create_task(scheduler.run(Priority.BACKGROUND, lambda: call("b2"))),
+            asyncio.create_task(
+                scheduler.run(Priority.INTERACTIVE, lambda: call("i1"))
+            ),
+        ]
+        await asyncio.sleep(0)
+
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics["in_flight"], 1)
+        self.assertEqual(metrics["background"]["queued"], 2)
+        self.assertEqual(metrics["interactive"]["queued"], 1)
+
+        gate.set()
+        await asyncio.gather(first, *tasks)
+
+        self.assertEqual(order, ["i1", "b1", "b2"])
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics["background"]["completed"], 3)
+        self.assertEqual(metrics["interactive"]["completed"], 1)
+        self.assertGreater(metrics["interactive"]["wait_max"], 0)
+        self.assertEqual(metrics["background"]["queued"], 0)
+
+    async def test_additive_increase(self) -> None:
+        scheduler = RequestScheduler(initial_limit=2, max_limit=3)
+
+        async def call() -> None:
+            return None
+
+        for _ in range(2):
+            await scheduler.run(Priority.INTERACTIVE, call)
+        self.assertAlmostEqual(scheduler.limit, 2.5 + 1 / 2.5)
+
+        for _ in range(10):
+            await scheduler.run(Priority.INTERACTIVE, call)
+        self.assertEqual(scheduler.limit, 3)
+
+    async def test_multiplicative_decrease_on_throttling(self) -> None:
+        scheduler = RequestScheduler(initial_limit=8)
+
+        async def throttled() -> None:
+            raise ClientResponseError(Mock(), (), status=429)
+
+        async def not_found() -> None:
+            raise ClientResponseError(Mock(), (), status=404)
+
+        with self.assertRaises(ClientResponseError):
+            await scheduler.run(Priority.BACKGROUND, throttled)
+        self.assertEqual(scheduler.limit, 4)
+
+        with self.assertRaises(ClientResponseError):
+            await scheduler.run(Priority.BACKGROUND, not_found)
+        self.assertEqual(scheduler.limit, 4)
+        self.assertEqual(scheduler.metrics()["throttled"], 1)
+        self.assertEqual(scheduler.metrics()["in_flight"], 0)
+
+    async def test_decrease_on_timeout(self) -> None:
+        scheduler = RequestScheduler(initial_limit=8)
+
+        async def timeout() -> None:
+            raise asyncio.TimeoutError()
+
+        async def server_timeout() -> None:
+            raise ServerTimeoutError("Timeout on reading data from socket")
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await scheduler.run(Priority.INTERACTIVE, timeout)
+        self.assertEqual(scheduler.limit, 4)
+
+        with self.assertRaises(ServerTimeoutError):
+            await scheduler.run(Priority.BACKGROUND, server_timeout)
+        self.assertEqual(scheduler.limit, 2)
+
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics["timeouts"], 2)
+        self.assertEqual(metrics["throttled"], 0)
+        self.assertEqual(metrics["in_flight"], 0)
+
+    async def test_decrease_once_per_round_trip(self) -> None:
+        scheduler = RequestScheduler(initial_limit=8)
+        gate = asyncio.Event()
+
+        async def unavailable() -> None:
+            await gate.wait()
+            raise ClientResponseError(Mock(), (), status=503)
+
+        tasks = [
+            asyncio.create_task(scheduler.run(Priority.BACKGROUND, unavailable))
+            for _ in range(4)
+        ]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.assertEqual(scheduler.limit, 4)
+
+    async def test_decrease_on_slow_response(self) -> None:
+        scheduler = RequestScheduler(initial_limit=4, latency_floor=0.01)
+
+        async def sleep(seconds: float) -> None:
+            await asyncio.sleep(seconds)
+
+        await scheduler.run(Priority.INTERACTIVE, lambda: sleep(0.005))
+        await scheduler.run(Priority.INTERACTIVE, lambda: sleep(0.05))
+        self.assertEqual(scheduler.limit, 2)
+
+    async def test_latency_baseline_per_priority(self) -> None:
+        scheduler = RequestScheduler(initial_limit=4, latency_floor=0.01)
+
+        async def sleep(seconds: float) -> None:
+            await asyncio.sleep(seconds)
+
+        # Library downloads are slow, but not slower than usual
+        await scheduler.run(Priority.INTERACTIVE, lambda: sleep(0.001))
+        for _ in range(3):
+            await scheduler.run(Priority.BACKGROUND, lambda: sleep(0.05))
+        self.assertEqual(scheduler.limit, 4)
+
+        metrics = scheduler.metrics()
+        self.assertGreaterEqual(metrics["background"]["latency_baseline"], 0.05)
+        self.assertLess(metrics["interactive"]["latency_baseline"], 0.05)
+
+    async def test_interactive_reserve(self) -> None:
+        scheduler = RequestScheduler(initial_limit=3, max_limit=3)
+        gate = asyncio.Event()
+
+        async def blocker() -> None:
+            await gate.wait()
+
+        background = [
+            asyncio.create_task(scheduler.run(Priority.BACKGROUND, blocker))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics["in_flight"], 2)
+        self.assertEqual(metrics["background"]["queued"], 1)
+
+        # The reserved slot lets an interactive request pass the queued background one
+        interactive = asyncio.create_task(scheduler.run(Priority.INTERACTIVE, blocker))
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.metrics()["in_flight"], 3)
+
+        gate.set()
+        await asyncio.gather(interactive, *background)
+        self.assertEqual(scheduler.metrics()["in_flight"], 0)
+
+    async def test_no_increase_below_limit(self) -> None:
+        scheduler = RequestScheduler(initial_limit=8)
+
+        async def call() -> None:
+            return None
+
+        for _ in range(20):
+            await scheduler.run(Priority.INTERACTIVE, call)
+        self.assertEqual(scheduler.limit, 8)
+
+    async def test_cancelled_waiter(self) -> None:
+        scheduler = RequestScheduler(initial_limit=1, max_limit=1)
+        gate = asyncio.Event()
+
+        async def blocker() -> None:
+            await gate.wait()
+
+        async def call() -> str:
+            return "done"
+
+        first = asyncio.create_task(scheduler.run(Priority.BACKGROUND, blocker))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(scheduler.run(Priority.INTERACTIVE, call))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.metrics()["interactive"]["queued"], 0)
+
+        gate.set()
+        await first
+        self.assertEqual(await scheduler.run(Priority.INTERACTIVE, call), "done")
+        self.assertEqual(scheduler.metrics()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
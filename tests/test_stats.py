@@ -0,0 +1,58 @@
+import unittest
+
+from ibroadcastaio.stats import TrackStatistics
+from ibroadcastaio.views import TrackViews
+from tests.stats_benchmark import run_stats_benchmark
+
+
+class TestTrackStatistics(unittest.TestCase):
+    def test_missing_values_are_skipped(self) -> None:
+        tracks = {
+            1: {
+                "album_id": 10,
+                "length": 100,
+                "year": 2001,
+                "uploaded_on": "2024-01-02",
+                "uploaded_time": "00:00:00",
+            },
+            2: {"album_id": 10, "length": None, "year": "2003", "uploaded_on": None},
+            3: {"album_id": 20, "length": "unknown", "uploaded_on": "2024-01-02"},
+        }
+        statistics = TrackStatistics(
+            tracks, {}, TrackViews(tracks).upload_timestamps, 0
+        )
+
+        summary = statistics.summary()
+        self.assertEqual(summary["count"], 3)
+        self.assertEqual(
+            summary["length"],
+            {"count": 1, "sum": 100, "min": 100, "max": 100, "mean": 100},
+        )
+        self.assertEqual(summary["year"]["min"], 2001)
+        self.assertEqual(summary["year"]["mean"], 2002)
+        # A missing upload time is not treated as 1970
+        self.assertEqual(summary["uploaded_time"]["count"], 1)
+        self.assertEqual(summary["uploaded_time"]["min"], 1704153600)
+
+        by_album = statistics.summary("album_id")
+        self.assertEqual(by_album[10]["count"], 2)
+        self.assertEqual(by_album[10]["length"]["mean"], 100)
+        self.assertEqual(
+            by_album[20]["length"],
+            {"count": 0, "sum": 0, "min": None, "max": None, "mean": None},
+        )
+
+
+class TestStatsBenchmark(unittest.IsolatedAsyncioTestCase):
+    async def test_equal_to_naive_loop(self) -> None:
+        # Timings are left to python -m tests.stats_benchmark, they are too noisy for CI
+        for group_by in (None, "album_id", "genre"):
+            report = await run_stats_benchmark(
+                track_count=2000, group_by=group_by, repeat=1
+            )
+
+            self.assertTrue(report["equal"])
+
+
+if __name__ == "__main__":
+    unittest.main()